@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from copy import deepcopy
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+sys.path.insert(0, BENCHMARKS)
+
+from synthetic_library import write_library
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_FORMAT = 1
+QUERIES = ("river café", "artist:\"artist 0001\" night")
+
+class FakeScreen:
+    def __init__(self, rows=50, cols=160):
+        self.rows = rows
+        self.cols = cols
+        self.writes = 0
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def addstr(self, y, x, text):
+        self.writes += 1
+
+    def attron(self, attr):
+        pass
+
+    def attroff(self, attr):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def clear(self):
+        pass
+
+    def nodelay(self, flag):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+    def timeout(self, delay):
+        pass
+
+    def getch(self):
+        return -1
+
+def fake_curses(curses):
+    curses.init_pair = lambda *args: None
+    curses.color_pair = lambda n: n << 8
+    curses.doupdate = lambda: None
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def load(cli):
+    started = time.perf_counter()
+    cli.load_library()
+    first = None
+    while cli.scanners:
+        cli.apply_scan_updates()
+        if first is None and cli.playlist:
+            first = time.perf_counter() - started
+        time.sleep(0.001)
+    total = time.perf_counter() - started
+    return first if first is not None else total, total
+
+def run_worker(args):
+    os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp(prefix="cache-", dir=args.workdir)
+    import main
+    from config import DEFAULT_CONFIG
+    from search_index import SearchIndex
+    fake_curses(main.curses)
+    root = os.path.join(args.workdir, f"library-{args.tracks}")
+    config = deepcopy(DEFAULT_CONFIG)
+    config["music_folders"] = [root]
+    config["watch_library"] = False
+    metrics = {}
+    cli = None
+    try:
+        for label in ("load_cold", "load_warm"):
+            cli = main.CLI(FakeScreen(args.rows, args.cols), config)
+            first, total = load(cli)
+            metrics[f"{label}_first_tracks_s"] = first
+            metrics[f"{label}_s"] = total
+        metrics["library_tracks"] = len(cli.playlist)
+
+        started = time.perf_counter()
+        index = SearchIndex(cli.display_names, cli.track_fields)
+        metrics["search_index_build_s"] = time.perf_counter() - started
+        samples = []
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                started = time.perf_counter()
+                index.search(query[:end])
+                samples.append(time.perf_counter() - started)
+        metrics["search_keystroke_s"] = summarize(samples)
+
+        cli.view_mode = 1
+        cli.display_menu(force_redraw=True)
+        metrics["frame_redraw_s"] = timed(lambda: cli.display_menu(force_redraw=True), args.repeat)
+        metrics["frame_idle_s"] = timed(cli.display_menu, args.repeat)
+
+        def scroll():
+            cli.selected_index = (cli.selected_index + 7) % len(cli.playlist)
+            cli.display_menu()
+        metrics["frame_scroll_s"] = timed(scroll, args.repeat)
+
+        cli.view_mode = 3
+        cli.album_view_selected = len(cli.albums) // 2
+        metrics["frame_albums_s"] = timed(lambda: cli.display_menu(force_redraw=True), args.repeat)
+
+        cli.view_mode = 4
+        cli.album_view_selected = len(cli.artists) // 2
+        metrics["frame_artists_s"] = timed(lambda: cli.display_menu(force_redraw=True), args.repeat)
+
+        cli.queue_list = list(cli.playlist[:200])
+        for view in (1, 2, 3):
+            cli.view_mode = view
+            metrics[f"current_names_view{view}_s"] = timed(lambda: len(cli.get_current_names()), args.repeat)
+    finally:
+        if cli is not None:
+            for scanner in cli.scanners.values():
+                scanner.cancel()
+        shutil.rmtree(os.environ["XDG_CACHE_HOME"], ignore_errors=True)
+    metrics["peak_rss_bytes"] = peak_rss()
+    result = {"tracks": args.tracks, "muse_version": main.APP_VERSION, "metrics": metrics}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+def median(value):
+    return value["median"] if isinstance(value, dict) else value
+
+def compare(report, baseline):
+    old_runs = {run["tracks"]: run["metrics"] for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        old = old_runs.get(run["tracks"])
+        if old is None:
+            continue
+        print(f"\n{run['tracks']} tracks vs baseline:")
+        for key, value in run["metrics"].items():
+            before, after = median(old.get(key)), median(value)
+            if not before or after is None:
+                continue
+            print(f"  {key:28} {before:14.6g} {after:14.6g} {100.0 * (after - before) / before:+8.1f}%")
+
+def print_report(report):
+    for run in report["runs"]:
+        print(f"\n{run['tracks']} tracks:")
+        for key, value in run["metrics"].items():
+            value = median(value)
+            print(f"  {key:28} {'n/a' if value is None else format(value, '.6g'):>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time library loading, search, drawing and views against synthetic libraries.")
+    parser.add_argument("--tracks", default="1000", help="comma separated library sizes, e.g. 1000,50000,500000")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "muse-bench"), help="where synthetic libraries are kept between runs")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", metavar="RESULTS", help="print the change against an earlier results file")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--cols", type=int, default=160)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+    if args.worker:
+        args.tracks = int(args.tracks)
+        run_worker(args)
+        return
+    report = {
+        "format": RESULTS_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    for count in [int(size) for size in args.tracks.split(",")]:
+        root = os.path.join(args.workdir, f"library-{count}")
+        started = time.perf_counter()
+        if write_library(root, count):
+            print(f"Generated {count} tracks in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        output = os.path.join(args.workdir, f"result-{count}.json")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--tracks", str(count),
+             "--workdir", args.workdir, "--output", output, "--repeat", str(args.repeat),
+             "--rows", str(args.rows), "--cols", str(args.cols)],
+            stdout=subprocess.DEVNULL, check=True
+        )
+        with open(output, encoding="utf-8") as f:
+            report["runs"].append(json.load(f))
+        os.remove(output)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import struct
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from track_memory import synthetic_rows
+
+EXTENSIONS = (".flac", ".ogg", ".wav", ".FLAC", ".Ogg", ".WAV")
+SAMPLE_RATE = 8000
+
+def vorbis_comment(tags):
+    vendor = b"muse-bench"
+    entries = [f"{key}={value}".encode("utf-8") for key, value in tags.items() if value]
+    data = struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(entries))
+    for entry in entries:
+        data += struct.pack("<I", len(entry)) + entry
+    return data
+
+def flac_bytes(tags, seconds):
+    samples = seconds * SAMPLE_RATE
+    info = struct.pack(">HH", 4096, 4096) + bytes(6)
+    info += ((SAMPLE_RATE << 44) | (15 << 36) | samples).to_bytes(8, "big") + bytes(16)
+    comment = vorbis_comment(tags)
+    return (b"fLaC" + bytes([0]) + len(info).to_bytes(3, "big") + info
+            + bytes([0x84]) + len(comment).to_bytes(3, "big") + comment)
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+CRC_TABLE = _crc_table()
+
+def ogg_crc(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+def ogg_page(packets, sequence, granule, flags=0, serial=0x4D555345):
+    lacing = bytearray()
+    for packet in packets:
+        lacing += bytes([255] * (len(packet) // 255) + [len(packet) % 255])
+    header = struct.pack("<4sBBqIIIB", b"OggS", 0, flags, granule, serial, sequence, 0, len(lacing))
+    page = bytearray(header + lacing + b"".join(packets))
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+def ogg_bytes(tags, seconds):
+    ident = b"\x01vorbis" + struct.pack("<IBIiiiBB", 0, 1, SAMPLE_RATE, 0, 0, 0, 0xB8, 1)
+    comment = b"\x03vorbis" + vorbis_comment(tags) + b"\x01"
+    setup = b"\x05vorbis" + bytes(8)
+    return (ogg_page([ident], 0, 0, flags=0x02)
+            + ogg_page([comment, setup], 1, 0)
+            + ogg_page([b"\0"], 2, seconds * SAMPLE_RATE, flags=0x04))
+
+def syncsafe(value):
+    return bytes([(value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F])
+
+def id3_bytes(tags):
+    frames = b""
+    for frame_id, key in (("TIT2", "title"), ("TPE1", "artist"), ("TALB", "album"), ("TRCK", "tracknumber")):
+        if tags.get(key):
+            body = b"\x03" + str(tags[key]).encode("utf-8")
+            frames += frame_id.encode("ascii") + syncsafe(len(body)) + b"\0\0" + body
+    return b"ID3\x04\x00\x00" + syncsafe(len(frames)) + frames
+
+def wav_bytes(tags, seconds):
+    data = bytes(SAMPLE_RATE // 10)
+    fmt = struct.pack("<HHIIHH", 1, 1, SAMPLE_RATE, SAMPLE_RATE, 1, 8)
+    tag = id3_bytes(tags)
+    tag += b"\0" * (len(tag) % 2)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    chunks += b"data" + struct.pack("<I", len(data)) + data
+    chunks += b"id3 " + struct.pack("<I", len(tag)) + tag
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+WRITERS = {".flac": flac_bytes, ".ogg": ogg_bytes, ".wav": wav_bytes}
+
+def write_library(root, count, extensions=EXTENSIONS):
+    marker = os.path.join(root, ".muse-bench")
+    try:
+        with open(marker, encoding="utf-8") as f:
+            if int(f.read()) == count:
+                return False
+    except (OSError, ValueError):
+        pass
+    folders = set()
+    for i, (path, _, title, artist, album, seconds, _, _, number) in enumerate(synthetic_rows(count, root=root, extensions=extensions)):
+        folder = os.path.dirname(path)
+        if folder not in folders:
+            os.makedirs(folder, exist_ok=True)
+            folders.add(folder)
+        tags = {
+            "title": title, "artist": "" if i % 23 == 0 else artist, "album": "" if i % 17 == 0 else album,
+            "tracknumber": "" if i % 29 == 0 else f"{number}/12"
+        }
+        with open(path, "wb") as f:
+            f.write(WRITERS[os.path.splitext(path)[1].lower()](tags, seconds))
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(str(count))
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic library of tiny tagged FLAC, Ogg Vorbis and WAV files.")
+    parser.add_argument("root")
+    parser.add_argument("--tracks", type=int, default=1000)
+    args = parser.parse_args()
+    if write_library(args.root, args.tracks):
+        print(f"Wrote {args.tracks} tracks to {args.root}")
+    else:
+        print(f"{args.root} already holds {args.tracks} tracks")
+
+if __name__ == "__main__":
+    main()
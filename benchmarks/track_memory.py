@@ -0,0 +1,57 @@
+import os
+import sys
+import gc
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata import format_duration
+from tracks import TrackStore
+
+WORDS = ("Blue", "Night", "Café", "Ünder", "River", "Static", "Łódź", "Glass", "Echo", "北京", "Summer", "Drift")
+
+def synthetic_rows(count, artists=2000, albums_per_artist=8, tracks_per_album=12, root="/home/user/Music", extensions=(".flac",)):
+    for i in range(count):
+        artist = f"Artist {i // (albums_per_artist * tracks_per_album) % artists:04}"
+        album = f"Album {i // tracks_per_album:06}"
+        title = f"{WORDS[i % len(WORDS)]} {WORDS[i // 7 % len(WORDS)]} number {i:07}"
+        extension = extensions[i % len(extensions)]
+        path = f"{root}/{artist}/{album}/{i % tracks_per_album + 1:02} {title}{extension}"
+        yield path, f"{artist} - {title}", title, artist, album, 120 + i % 480, "", 0, i % tracks_per_album + 1
+
+def build_lists(rows):
+    playlist, display_names, durations = [], [], []
+    fields = {"artist": [], "title": [], "album": [], "duration": []}
+    albums = {}
+    for path, name, title, artist, album, duration, *_ in rows:
+        playlist.append(path)
+        display_names.append(name)
+        durations.append(format_duration(duration))
+        fields["artist"].append(artist)
+        fields["title"].append(title)
+        fields["album"].append(album)
+        fields["duration"].append(duration)
+        albums.setdefault(album, []).append("".join(path))
+    playlist_index = {song: i for i, song in enumerate(playlist)}
+    return playlist, playlist_index, display_names, durations, fields, albums
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    result = build(synthetic_rows(count))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description="Report memory per track for the library layouts.")
+    parser.add_argument("--tracks", type=int, default=100000)
+    args = parser.parse_args()
+    for label, build in (("lists", build_lists), ("store", TrackStore.from_rows)):
+        size = measure(build, args.tracks)
+        print(f"{label:6} {args.tracks} tracks: {size / 2**20:8.1f} MiB, {size / args.tracks:7.1f} bytes/track")
+
+if __name__ == "__main__":
+    main()
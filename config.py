@@ -23,12 +23,23 @@ DEFAULT_CONFIG = {
         "clear_queue": [":clear"],
         "remove_queue": [":remove"]
     },
-    "music_folder": "",
+    "music_folders": [],
     "seek_seconds": 5,
     "shuffle": False,
     "repeat": False,
     "volume": 1.0,
-    "default_view": 1
+    "default_view": 1,
+    "scan_workers": 0,
+    "scan_executor": "thread",
+    "follow_symlinks": True,
+    "watch_library": True,
+    "watch_poll_interval": 30,
+    "metadata_cache_size": 4096,
+    "prefetch_tracks": 3,
+    "prefetch_bytes": 67108864,
+    "stats_file": "",
+    "stats_interval": 60,
+    "daemon_socket": ""
 }
 
 def load_config(path="config.json"):
@@ -42,17 +53,21 @@ def load_config(path="config.json"):
         for k in DEFAULT_CONFIG["keybindings"]:
             if k not in config["keybindings"]:
                 config["keybindings"][k] = DEFAULT_CONFIG["keybindings"][k]
-        if "music_folder" in config:
-            config["music_folder"] = os.path.expanduser(config["music_folder"])
+        folder = config.pop("music_folder", "")
+        if folder and not config["music_folders"]:
+            config["music_folders"] = [folder]
+        config["music_folders"] = [os.path.expanduser(f) for f in config["music_folders"]]
         return config
     return DEFAULT_CONFIG.copy()
 
 def save_config(config, path="config.json"):
     path = os.path.expanduser(path)
     config_to_save = config.copy()
-    if "music_folder" in config_to_save:
+    if "music_folders" in config_to_save:
         home = os.path.expanduser("~")
-        if config_to_save["music_folder"].startswith(home):
-            config_to_save["music_folder"] = config_to_save["music_folder"].replace(home, "~", 1)
+        config_to_save["music_folders"] = [
+            f.replace(home, "~", 1) if f.startswith(home) else f
+            for f in config_to_save["music_folders"]
+        ]
     with open(path, "w", encoding="utf-8") as f:
         json.dump(config_to_save, f, indent=2)
\ No newline at end of file
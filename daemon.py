@@ -0,0 +1,472 @@
+import os
+import sys
+import json
+import time
+import errno
+import signal
+import socket
+import selectors
+import stats
+import library
+from collections import deque
+from session import Session
+from search_index import SearchWorker
+
+MAX_LINE = 65536
+MAX_OUTPUT = 1 << 20
+SEARCH_LIMIT = 50
+SNAPSHOT_DELAY = 2.0
+
+def default_socket_path(config=None):
+    path = (config or {}).get("daemon_socket", "")
+    if path:
+        return os.path.expanduser(path)
+    base = os.environ.get("XDG_RUNTIME_DIR") or library.cache_dir()
+    return os.path.join(base, "muse.sock")
+
+def socket_argument(argv, config):
+    if "--socket" in argv:
+        i = argv.index("--socket")
+        if i + 1 < len(argv):
+            return os.path.expanduser(argv[i + 1])
+    return default_socket_path(config)
+
+def parse_switch(value, current):
+    value = value.strip().lower()
+    if value in ("on", "true", "1"):
+        return True
+    if value in ("off", "false", "0"):
+        return False
+    if value in ("", "toggle"):
+        return not current
+    raise ValueError(f"expected on, off or toggle, got {value!r}")
+
+class Daemon(Session):
+    def __init__(self, config, socket_path, version=""):
+        super().__init__(config, version=version)
+        self.socket_path = socket_path
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        self.outgoing = {}
+        self.server = None
+        self.running = False
+        self.snapshot_delay = SNAPSHOT_DELAY
+        self.search_worker = SearchWorker(notify=self.wake)
+        self.searches = deque()
+        self.searching = None
+        self.search_results = []
+        self.waiting = set()
+        self.conn = None
+        self.commands = {
+            "status": self.cmd_status,
+            "play": self.cmd_play,
+            "pause": self.cmd_pause,
+            "toggle": self.cmd_toggle,
+            "next": self.cmd_next,
+            "prev": self.cmd_prev,
+            "enqueue": self.cmd_enqueue,
+            "dequeue": self.cmd_dequeue,
+            "clear": self.cmd_clear,
+            "search": self.cmd_search,
+            "volume": self.cmd_volume,
+            "seek": self.cmd_seek,
+            "fadeout": self.cmd_fadeout,
+            "shuffle": self.cmd_shuffle,
+            "repeat": self.cmd_repeat,
+            "refresh": self.cmd_refresh,
+            "shutdown": self.cmd_shutdown,
+        }
+
+    def listen(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path)
+            else:
+                raise OSError(errno.EADDRINUSE, f"Muse daemon already running on {self.socket_path}")
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o700, exist_ok=True)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self.server.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        self.server.listen(8)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_fds[0], selectors.EVENT_READ)
+
+    def stop(self, signum=None, frame=None):
+        self.running = False
+        self.wake()
+
+    def serve(self):
+        self.listen()
+        self.running = True
+        self.load_library()
+        try:
+            while self.running:
+                self.poll_playback()
+                changed = self.apply_scan_updates()
+                if self.apply_watch_updates() or changed:
+                    self.search_worker.invalidate()
+                self.poll_search()
+                self.update_prefetch()
+                self.dump_stats()
+                for key, events in self.selector.select(self.next_timeout()):
+                    if key.fileobj is self.server:
+                        self.accept()
+                    elif key.fileobj == self.wakeup_fds[0]:
+                        try:
+                            os.read(self.wakeup_fds[0], 4096)
+                        except OSError:
+                            pass
+                    else:
+                        if events & selectors.EVENT_WRITE and key.fileobj in self.clients:
+                            self.flush(key.fileobj)
+                        if events & selectors.EVENT_READ and key.fileobj in self.clients:
+                            self.receive(key.fileobj)
+        finally:
+            for conn in list(self.clients):
+                self.flush(conn)
+                if conn in self.clients:
+                    self.disconnect(conn)
+            self.selector.unregister(self.server)
+            self.server.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+            self.close()
+            self.save_state()
+
+    def accept(self):
+        try:
+            conn, _ = self.server.accept()
+        except OSError:
+            return
+        conn.setblocking(False)
+        self.clients[conn] = b""
+        self.outgoing[conn] = b""
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def disconnect(self, conn):
+        self.selector.unregister(conn)
+        del self.clients[conn]
+        del self.outgoing[conn]
+        self.waiting.discard(conn)
+        conn.close()
+
+    def receive(self, conn):
+        try:
+            data = conn.recv(MAX_LINE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.disconnect(conn)
+            return
+        self.clients[conn] += data
+        if len(self.clients[conn].rpartition(b"\n")[2]) > MAX_LINE:
+            self.disconnect(conn)
+            return
+        self.process(conn)
+
+    def process(self, conn):
+        replies = []
+        while conn not in self.waiting and b"\n" in self.clients[conn]:
+            line, _, self.clients[conn] = self.clients[conn].partition(b"\n")
+            self.conn = conn
+            reply = self.handle(line.decode("utf-8", "replace"))
+            if reply is not None:
+                replies.append(reply)
+        self.send(conn, replies)
+
+    def send(self, conn, replies):
+        if not replies:
+            return
+        self.outgoing[conn] += b"".join(json.dumps(reply).encode("utf-8") + b"\n" for reply in replies)
+        if len(self.outgoing[conn]) > MAX_OUTPUT:
+            self.disconnect(conn)
+            return
+        self.flush(conn)
+
+    def flush(self, conn):
+        data = self.outgoing[conn]
+        if data:
+            try:
+                data = data[conn.send(data):]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self.disconnect(conn)
+                return
+        self.outgoing[conn] = data
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if data else selectors.EVENT_READ
+        if self.selector.get_key(conn).events != events:
+            self.selector.modify(conn, events)
+
+    def handle(self, line):
+        started = time.perf_counter()
+        command, _, argument = line.strip().partition(" ")
+        handler = self.commands.get(command.lower())
+        if handler is None:
+            reply = {"ok": False, "error": f"unknown command: {command}"}
+        else:
+            try:
+                reply = handler(argument.strip())
+            except (ValueError, IndexError) as e:
+                reply = {"ok": False, "error": str(e)}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if reply is not None:
+            stats.record("request", time.perf_counter() - started)
+        return reply
+
+    def result(self):
+        if self.error_message.startswith("Failed to play"):
+            return {"ok": False, "error": self.error_message}
+        return {"ok": True}
+
+    def track_path(self, argument):
+        if argument.isdigit():
+            if not 0 < int(argument) <= len(self.playlist):
+                raise ValueError(f"no track number {argument}")
+            return self.playlist[int(argument) - 1]
+        path = os.path.abspath(os.path.expanduser(argument))
+        if self.tracks.position(path) is None and not os.path.isfile(path):
+            raise ValueError(f"no such track: {argument}")
+        return path
+
+    def cmd_status(self, argument):
+        song = self.current_song_path
+        index = self.tracks.position(song)
+        track = self.tracks.track(index) if index is not None else None
+        return {
+            "ok": True,
+            "playing": self.player.playing,
+            "song": song,
+            "name": track.name if track else None,
+            "position": self.player.get_pos() if song else 0,
+            "duration": track.duration if track else None,
+            "volume": self.volume,
+            "shuffle": self.shuffle,
+            "repeat": self.repeat,
+            "queue": self.queue_list,
+            "queue_index": self.queue_index,
+            "tracks": len(self.playlist),
+            "scanning": bool(self.scanners),
+            "library": self.library_generation,
+            "error": self.error_message,
+        }
+
+    def cmd_play(self, argument):
+        if argument:
+            self.play_song(self.track_path(argument))
+        elif self.current_song_path:
+            self.player.unpause()
+        elif self.queue_index < len(self.queue_list):
+            self.advance()
+        elif self.playlist:
+            self.play_song(self.playlist[0])
+        return self.result()
+
+    def cmd_pause(self, argument):
+        self.player.pause()
+        return {"ok": True}
+
+    def cmd_toggle(self, argument):
+        self.toggle_play_pause()
+        return {"ok": True}
+
+    def cmd_next(self, argument):
+        self.next_song()
+        return self.result()
+
+    def cmd_prev(self, argument):
+        self.prev_song()
+        return self.result()
+
+    def cmd_enqueue(self, argument):
+        self.enqueue(self.track_path(argument))
+        return {"ok": True, "queue": len(self.queue_list)}
+
+    def cmd_dequeue(self, argument):
+        if not self.dequeue(int(argument) - 1):
+            raise ValueError("invalid queue index")
+        return {"ok": True, "queue": len(self.queue_list)}
+
+    def cmd_clear(self, argument):
+        self.clear_queue()
+        return {"ok": True}
+
+    def cmd_search(self, argument):
+        self.waiting.add(self.conn)
+        self.searches.append((self.conn, argument, time.perf_counter()))
+        self.start_search()
+
+    def poll_search(self):
+        if self.searching:
+            done = not self.search_worker.pending
+            results = self.search_worker.take()
+            if results is not None:
+                self.search_results = results
+            if not done:
+                return
+            conn, started, playlist, names = self.searching
+            self.searching = None
+            if self.search_worker.error:
+                reply = {"ok": False, "error": self.search_worker.error}
+            else:
+                reply = {
+                    "ok": True,
+                    "results": [{"path": playlist[i], "name": names[i]} for i in self.search_results[:SEARCH_LIMIT]],
+                }
+            stats.record("request", time.perf_counter() - started)
+            if conn in self.clients:
+                self.waiting.discard(conn)
+                self.send(conn, [reply])
+                if conn in self.clients:
+                    self.process(conn)
+        self.start_search()
+
+    def start_search(self):
+        while self.searches and not self.searching:
+            conn, query, started = self.searches.popleft()
+            if conn not in self.clients:
+                continue
+            self.searching = (conn, started, self.playlist, self.display_names)
+            self.search_results = []
+            self.search_worker.submit(query, self.display_names, self.track_fields)
+
+    def cmd_volume(self, argument):
+        if argument:
+            self.set_volume(float(argument))
+        return {"ok": True, "volume": self.volume}
+
+    def cmd_seek(self, argument):
+        return {"ok": bool(self.current_song_path) and self.player.seek(float(argument))}
+
+    def cmd_fadeout(self, argument):
+        self.player.fadeout()
+        return {"ok": True}
+
+    def cmd_shuffle(self, argument):
+        self.set_shuffle(parse_switch(argument, self.shuffle))
+        return {"ok": True, "shuffle": self.shuffle}
+
+    def cmd_repeat(self, argument):
+        self.set_repeat(parse_switch(argument, self.repeat))
+        return {"ok": True, "repeat": self.repeat}
+
+    def cmd_refresh(self, argument):
+        self.refresh_library()
+        return {"ok": True}
+
+    def cmd_shutdown(self, argument):
+        self.stop()
+        return {"ok": True}
+
+class Client:
+    def __init__(self, path, timeout=5.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.file = self.sock.makefile("rb")
+
+    def request(self, command, argument=""):
+        line = f"{command} {argument}".strip() if argument else command
+        self.sock.sendall(line.encode("utf-8") + b"\n")
+        reply = self.file.readline()
+        if not reply:
+            raise ConnectionError("Muse daemon closed the connection")
+        return json.loads(reply)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+class RemotePlayer:
+    def __init__(self, request):
+        self.request = request
+        self.gapless = False
+        self.playing = False
+        self.current_song = None
+        self.position = 0
+        self.volume = 1.0
+
+    def update(self, status):
+        self.playing = status["playing"]
+        self.current_song = status["song"]
+        self.position = status["position"]
+        self.volume = status["volume"]
+
+    def stop(self):
+        pass
+
+    def load_song(self, song_path):
+        self.current_song = song_path
+
+    def play(self):
+        reply = self.request("play", self.current_song)
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        self.playing = True
+
+    def pause(self):
+        self.request("pause")
+        self.playing = False
+
+    def unpause(self):
+        self.request("play")
+        self.playing = True
+
+    def fadeout(self, ms=2000):
+        self.request("fadeout")
+        self.playing = False
+
+    def seek(self, seconds):
+        return self.request("seek", str(seconds))["ok"]
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def get_volume(self):
+        return self.volume
+
+    def get_pos(self):
+        return self.position
+
+    def poll_end(self):
+        return None
+
+    def time_remaining(self):
+        return None
+
+    def queue_song(self, song_path):
+        return False
+
+    def transition_stats(self):
+        return {}
+
+def main(version="", argv=None):
+    from config import load_config
+    argv = sys.argv if argv is None else argv
+    if not hasattr(socket, "AF_UNIX"):
+        print("Daemon mode needs Unix domain sockets, which this platform does not provide.", file=sys.stderr)
+        return 1
+    config = load_config()
+    daemon = Daemon(config, socket_argument(argv, config), version)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    try:
+        daemon.serve()
+    except OSError as e:
+        print(f"muse: {e}", file=sys.stderr)
+        return 1
+    return 0
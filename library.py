@@ -0,0 +1,498 @@
+import os
+import sys
+import time
+import queue
+import sqlite3
+import threading
+import stats
+from collections import OrderedDict
+from metadata import read_tags, open_pool
+from tracks import TrackStore
+from utils import get_folder_hash
+
+EXTENSIONS = frozenset([
+    '.mp3', '.wav', '.flac', '.ogg', '.aac', '.m4a', '.wma',
+    '.aiff', '.ape', '.opus', '.mpc', '.spx', '.wv', '.tta',
+    '.mp2', '.mp1', '.caf', '.dsf', '.dff', '.au', '.snd',
+    '.oga', '.mogg', '.xm', '.mod', '.it', '.s3m', '.mtm', '.umx'
+])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS albums (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path BLOB NOT NULL,
+    size INTEGER,
+    mtime INTEGER,
+    name TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    duration INTEGER,
+    album_id INTEGER REFERENCES albums(id),
+    artist_id INTEGER REFERENCES artists(id),
+    album_artist_id INTEGER REFERENCES artists(id),
+    disc INTEGER NOT NULL DEFAULT 0,
+    number INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tracks_path ON tracks(path);
+CREATE INDEX IF NOT EXISTS idx_tracks_album ON tracks(album_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_artist ON tracks(artist_id);
+"""
+
+MIGRATE_NUMBERS = """
+ALTER TABLE tracks ADD COLUMN album_artist_id INTEGER REFERENCES artists(id);
+ALTER TABLE tracks ADD COLUMN disc INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE tracks ADD COLUMN number INTEGER NOT NULL DEFAULT 0;
+UPDATE tracks SET mtime = NULL;
+"""
+
+MIGRATE_PATHS = """
+DROP INDEX IF EXISTS idx_tracks_path;
+DROP INDEX IF EXISTS idx_tracks_album;
+DROP INDEX IF EXISTS idx_tracks_artist;
+ALTER TABLE tracks RENAME TO tracks_text;
+""" + SCHEMA + """
+INSERT INTO tracks(id, path, size, mtime, name, title, duration, album_id, artist_id, album_artist_id, disc, number)
+    SELECT id, CAST(path AS BLOB), size, mtime, name, title, duration, album_id, artist_id, album_artist_id, disc, number
+    FROM tracks_text;
+DROP TABLE tracks_text;
+"""
+
+def to_db_text(value):
+    try:
+        value.encode("utf-8")
+    except UnicodeEncodeError:
+        return value.encode("utf-8", "surrogatepass")
+    return value
+
+def from_db_text(value):
+    return value.decode("utf-8", "surrogatepass") if isinstance(value, bytes) else value
+
+def cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base, "muse")
+
+def index_path(path):
+    return os.path.join(cache_dir(), f"library_{get_folder_hash(path)}.db")
+
+def snapshot_path(path):
+    return os.path.join(cache_dir(), f"library_{get_folder_hash(path)}.tracks")
+
+def iter_folders(path, follow_symlinks=True):
+    stack = [path]
+    visited = set()
+    while stack:
+        folder = stack.pop()
+        if follow_symlinks:
+            try:
+                st = os.stat(folder)
+            except OSError:
+                continue
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                continue
+            visited.add(key)
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        files = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    stack.append(entry.path)
+                else:
+                    files.append(entry)
+            except OSError:
+                continue
+        yield folder, files
+
+def is_song(path):
+    return os.path.splitext(path)[1].lower() in EXTENSIONS
+
+def iter_song_entries(path, follow_symlinks=True):
+    for _, files in iter_folders(path, follow_symlinks):
+        for entry in files:
+            try:
+                if is_song(entry.name) and entry.is_file(follow_symlinks=follow_symlinks):
+                    yield entry
+            except OSError:
+                continue
+
+def file_stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return (None, None)
+
+def entry_stat(entry):
+    try:
+        st = entry.stat()
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return (None, None)
+
+class LibraryIndex:
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        if "number" not in {row[1] for row in self.conn.execute("PRAGMA table_info(tracks)")}:
+            self.conn.executescript(MIGRATE_NUMBERS)
+        if {row[1]: row[2] for row in self.conn.execute("PRAGMA table_info(tracks)")}["path"] != "BLOB":
+            self.conn.executescript(MIGRATE_PATHS)
+        self._ids = {"artists": {}, "albums": {}}
+
+    def close(self):
+        self.conn.close()
+
+    def rows(self, where="", params=()):
+        rows = self.conn.execute(
+            """SELECT tracks.path, tracks.size, tracks.mtime, tracks.name, tracks.duration,
+                tracks.title, artists.name, albums.name, album_artists.name, tracks.disc, tracks.number
+            FROM tracks
+            LEFT JOIN artists ON artists.id = tracks.artist_id
+            LEFT JOIN albums ON albums.id = tracks.album_id
+            LEFT JOIN artists AS album_artists ON album_artists.id = tracks.album_artist_id """ + where,
+            params
+        )
+        return {
+            os.fsdecode(path): (size, mtime, from_db_text(name), duration, *rest)
+            for path, size, mtime, name, duration, *rest in rows
+        }
+
+    def rows_under(self, path):
+        if not os.path.isdir(path):
+            rows = self.rows("WHERE tracks.path = ?", (os.fsencode(path),))
+            if rows:
+                return rows
+        prefix = os.fsencode(path.rstrip(os.sep) + os.sep)
+        return self.rows("WHERE tracks.path >= ? AND tracks.path < ?", (prefix, prefix[:-1] + bytes([prefix[-1] + 1])))
+
+    def _name_id(self, table, name):
+        if not name:
+            return None
+        ids = self._ids[table]
+        if name not in ids:
+            self.conn.execute(f"INSERT INTO {table}(name) VALUES (?) ON CONFLICT(name) DO NOTHING", (name,))
+            ids[name] = self.conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+        return ids[name]
+
+    def upsert(self, path, stat, info):
+        try:
+            self._upsert(path, stat, info)
+        except (UnicodeEncodeError, OverflowError, sqlite3.InterfaceError):
+            return False
+        return True
+
+    def _upsert(self, path, stat, info):
+        self.conn.execute(
+            """INSERT INTO tracks(path, size, mtime, name, title, duration, album_id, artist_id, album_artist_id, disc, number)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime = excluded.mtime,
+                name = excluded.name,
+                title = excluded.title,
+                duration = excluded.duration,
+                album_id = excluded.album_id,
+                artist_id = excluded.artist_id,
+                album_artist_id = excluded.album_artist_id,
+                disc = excluded.disc,
+                number = excluded.number""",
+            (
+                os.fsencode(path), stat[0], stat[1], to_db_text(info["name"]), to_db_text(info["title"]), info["duration"],
+                self._name_id("albums", info["album"]), self._name_id("artists", info["artist"]),
+                self._name_id("artists", info["album_artist"]), info["disc"], info["number"]
+            )
+        )
+
+    def remove(self, paths):
+        self.conn.executemany("DELETE FROM tracks WHERE path = ?", ((os.fsencode(path),) for path in paths))
+
+    def prune(self, albums=None, artists=None):
+        if albums is None and artists is None:
+            self.conn.execute("DELETE FROM albums WHERE id NOT IN (SELECT album_id FROM tracks WHERE album_id IS NOT NULL)")
+            self.conn.execute(
+                """DELETE FROM artists WHERE id NOT IN (SELECT artist_id FROM tracks WHERE artist_id IS NOT NULL)
+                AND id NOT IN (SELECT album_artist_id FROM tracks WHERE album_artist_id IS NOT NULL)"""
+            )
+            self._ids = {"artists": {}, "albums": {}}
+            return
+        for table, where, names in (
+            ("albums", "album_id = albums.id", albums or ()),
+            ("artists", "artist_id = artists.id OR album_artist_id = artists.id", artists or ())
+        ):
+            for name in names:
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE name = ? AND NOT EXISTS (SELECT 1 FROM tracks WHERE {where})",
+                    (name,)
+                )
+                self._ids[table].pop(name, None)
+
+    def commit(self):
+        self.conn.commit()
+
+    def generation(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def bump(self):
+        self.conn.execute(f"PRAGMA user_version = {self.generation() + 1}")
+
+    def save_snapshot(self, path):
+        return self.tracks().save(path, self.generation())
+
+    def tracks(self):
+        rows = self.conn.execute(
+            """SELECT tracks.path, tracks.name, tracks.title, artists.name, albums.name, tracks.duration,
+                album_artists.name, tracks.disc, tracks.number
+            FROM tracks
+            LEFT JOIN artists ON artists.id = tracks.artist_id
+            LEFT JOIN albums ON albums.id = tracks.album_id
+            LEFT JOIN artists AS album_artists ON album_artists.id = tracks.album_artist_id
+            ORDER BY tracks.path"""
+        )
+        return TrackStore.from_rows(sorted(
+            (os.fsdecode(path), from_db_text(name), from_db_text(title), *rest)
+            for path, name, title, *rest in rows
+        ))
+
+def placeholder_tracks(found, rows, parsed=None):
+    def placeholder_rows():
+        for path in sorted(found):
+            info = parsed.get(path) if parsed else None
+            row = rows.get(path)
+            if info:
+                yield (path, info["name"], info["title"], info["artist"], info["album"], info["duration"],
+                       info["album_artist"], info["disc"], info["number"])
+            elif row:
+                _, _, name, duration, title, artist, album, album_artist, disc, number = row
+                yield path, name, title, artist, album, duration, album_artist, disc, number
+            else:
+                yield path, os.path.splitext(os.path.basename(path))[0], "", "", "", None
+    return TrackStore.from_rows(placeholder_rows())
+
+def collapse_paths(paths):
+    kept = []
+    for path in sorted(paths):
+        if kept and path.startswith(kept[-1].rstrip(os.sep) + os.sep):
+            continue
+        kept.append(path)
+    return kept
+
+def refresh_paths(index, paths, follow_symlinks=True):
+    found = {}
+    known = {}
+    for path in collapse_paths(paths):
+        if os.path.isdir(path):
+            for entry in iter_song_entries(path, follow_symlinks):
+                found[entry.path] = entry_stat(entry)
+        elif is_song(path) and os.path.isfile(path):
+            found[path] = file_stat(path)
+        known.update(index.rows_under(path))
+    removed = [path for path in known if path not in found]
+    changed = sorted(path for path in found if (known.get(path) or (None, None))[:2] != found[path])
+    if not removed and not changed:
+        return [], []
+    updated = [(path, read_tags(path)) for path in changed]
+    index.remove(removed)
+    for path, info in updated:
+        index.upsert(path, found[path], info)
+    stale = [known[path] for path in removed + changed if path in known]
+    index.prune({row[6] for row in stale if row[6]}, {name for row in stale for name in (row[5], row[7]) if name})
+    index.bump()
+    index.commit()
+    return removed, updated
+
+class Scanner:
+    def __init__(self, path, workers=0, executor="thread", follow_symlinks=True, notify=None, generation=None):
+        self.path = path
+        self.generation = generation
+        self.workers = workers
+        self.executor = executor
+        self.follow_symlinks = follow_symlinks
+        self.notify = notify
+        self.updates = queue.Queue()
+        self.phase = "walk"
+        self.found = 0
+        self.parsed = 0
+        self.total = 0
+        self.started = time.monotonic()
+        self.parse_started = None
+        self.done = False
+        self._cancelled = threading.Event()
+        self._priority = ()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._walked = False
+        self._walk_error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def prioritize(self, paths):
+        with self._lock:
+            self._priority = tuple(paths)
+
+    def rate(self):
+        if not self.parse_started or not self.parsed:
+            return 0.0
+        return self.parsed / max(1e-6, time.monotonic() - self.parse_started)
+
+    def eta(self):
+        rate = self.rate()
+        if not rate:
+            return None
+        return (self.total - self.parsed) / rate
+
+    def _post(self, *message):
+        self.updates.put(message)
+        if self.notify:
+            self.notify()
+
+    def run(self):
+        try:
+            index = LibraryIndex(index_path(self.path))
+        except Exception as e:
+            self._post("error", str(e))
+            self._finish()
+            return
+        try:
+            self._scan(index)
+        except Exception as e:
+            self._post("error", str(e))
+        finally:
+            index.close()
+            self._finish()
+
+    def _finish(self):
+        self.phase = "done"
+        self.done = True
+        self._post("done")
+
+    def _next_batch(self, pending, size):
+        batch = [path for path in self._priority if path in pending][:size]
+        for path in batch:
+            del pending[path]
+        while pending and len(batch) < size:
+            batch.append(pending.popitem(last=False)[0])
+        return batch
+
+    def _scan(self, index):
+        rows = index.rows()
+        stale = index.generation() != self.generation
+        if rows and stale:
+            self._post("library", index.tracks())
+        found = {}
+        pending = OrderedDict()
+        walker = threading.Thread(target=self._walk, args=(rows, found, pending), daemon=True)
+        walker.start()
+        try:
+            self._parse(index, rows, found, pending)
+        except Exception:
+            self.cancel()
+            raise
+        finally:
+            walker.join()
+        if self._walk_error:
+            raise self._walk_error
+        if self.cancelled:
+            return
+        changed = self.total
+        removed = [path for path in rows if path not in found]
+        index.remove(removed)
+        index.prune()
+        if removed:
+            index.bump()
+        index.commit()
+        if changed or removed or not rows:
+            self._post("library", index.tracks())
+        if changed or removed or stale:
+            index.save_snapshot(snapshot_path(self.path))
+
+    def _walk(self, rows, found, pending):
+        try:
+            for entry in iter_song_entries(self.path, self.follow_symlinks):
+                if self.cancelled:
+                    return
+                key = entry_stat(entry)
+                with self._ready:
+                    found[entry.path] = key
+                    self.found += 1
+                    if (rows.get(entry.path) or (None, None))[:2] != key:
+                        pending[entry.path] = None
+                        self.total += 1
+                        self._ready.notify()
+        except Exception as e:
+            self._walk_error = e
+        finally:
+            with self._ready:
+                remaining = sorted(pending)
+                pending.clear()
+                pending.update(dict.fromkeys(remaining))
+                if self.total:
+                    self.phase = "tags"
+                self._walked = True
+                self._ready.notify()
+
+    def _parse(self, index, rows, found, pending):
+        pool, workers = open_pool(self.workers, self.executor)
+        batch_size = max(1, workers * 4)
+        parsed = {}
+        try:
+            while not self.cancelled:
+                with self._ready:
+                    while not self._walked and len(pending) < batch_size and not self.cancelled:
+                        self._ready.wait(0.1)
+                    walked = self._walked
+                    batch = self._next_batch(pending, batch_size)
+                if walked and self._walk_error:
+                    break
+                if walked and parsed is not None:
+                    if self.total:
+                        self._post("library", placeholder_tracks(found, rows, parsed))
+                    parsed = None
+                if not batch:
+                    if walked:
+                        break
+                    continue
+                if self.parse_started is None:
+                    self.parse_started = time.monotonic()
+                if pool:
+                    results = list(pool.map(read_tags, batch, chunksize=max(1, len(batch) // workers)))
+                else:
+                    results = [read_tags(path) for path in batch]
+                for path, info in zip(batch, results):
+                    index.upsert(path, found[path], info)
+                index.bump()
+                index.commit()
+                self.parsed += len(batch)
+                if parsed is None:
+                    self._post("tags", list(zip(batch, results)))
+                else:
+                    parsed.update(zip(batch, results))
+            if self.parsed and not self.cancelled:
+                stats.gauge("scan_tracks_per_s", round(self.rate(), 1))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
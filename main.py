@@ -1,14 +1,6 @@
 import os
 import sys
-import glob
-import time
-import random
-import json
-from music_player import MusicPlayer
-from mutagen import File
-from config import load_config, save_config
-from utils import key_match, search, get_folder_hash
-from ui import keybinding_helper_row, help_text
+import startup
 
 APP_VERSION = "1.1.2"
 
@@ -16,8 +8,38 @@ if len(sys.argv) > 1 and sys.argv[1] in ("-v", "--version"):
     print(APP_VERSION)
     sys.exit(0)
 
+if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+    from config import load_config
+    from ui import help_text
+    print("Usage: muse [-v | --version] [-h | --help] [--timings] [--daemon | --attach] [--socket PATH]\n")
+    print(help_text(load_config().get("keybindings", {})))
+    sys.exit(0)
+
+if "--daemon" in sys.argv:
+    import daemon
+    sys.exit(daemon.main(APP_VERSION))
+
+import time
+import select
+import signal
+import multiprocessing
+from bisect import bisect_left
+import stats
+import metadata
+from session import Session
+from daemon import Client, RemotePlayer, socket_argument
+from config import load_config
+from utils import key_match
+from search_index import SearchWorker
+from tracks import album_key
+from ui import keybinding_helper_row, help_text, stats_lines
+
 if sys.platform == "win32":
-    os.system(f"title Muse {APP_VERSION}")
+    try:
+        import ctypes
+        ctypes.windll.kernel32.SetConsoleTitleW(f"Muse {APP_VERSION}")
+    except Exception:
+        os.system(f"title Muse {APP_VERSION}")
 else:
     print(f"\33]0;Muse {APP_VERSION}\a", end="", flush=True)
 
@@ -30,107 +52,132 @@ except ImportError:
     else:
         raise
 
-class CLI:
-    def __init__(self, stdscr, config):
-        self.player = MusicPlayer()
+startup.mark("imports")
+
+class CLI(Session):
+    def __init__(self, stdscr, config, player=None):
+        super().__init__(config, player, APP_VERSION)
         self.stdscr = stdscr
-        self.config = config
         self.keybindings = config.get("keybindings", {})
-        self.music_folder = os.path.expanduser(config.get("music_folder", ""))
-        self.seek_seconds = config.get("seek_seconds", 5)
-        self.playlist = []
-        self.display_names = []
-        self.durations = []
-        self.current_index = None
-        self.current_song_path = None
         self.selected_index = 0
         self.scroll_offset = 0
-        self.shuffle = config.get("shuffle", False)
-        self.repeat = config.get("repeat", False)
-        self.last_top_bar = ""
-        self.last_command_input = ""
-        self.last_status = ""
-        self.last_selected = -1
-        self.last_display_names = []
-        self.last_scroll_offset = -1
-        self.volume = config.get("volume", 1.0)
-        self.player.set_volume(self.volume)
+        self.screen_rows = {}
+        self.screen_size = (0, 0)
+        self.screen_dirty = False
+        self.resized = False
+        self.status_line = keybinding_helper_row(self.keybindings) + " | 1:Library 2:Queue 3:Albums 4:Artists"
         self.view_mode = config.get("default_view", 1)
-        self.queue_list = []
         self.version_message = ""
-        self.albums = {}
-        self.album_names = []
         self.album_view_selected = 0
-        self.queue_index = 0
         self.album_songs_scroll = 0
         self.album_song_selected = 0
         self.search_selected = 0
         self.album_column = 0
-        self.error_message = ""
+        self.search_worker = SearchWorker(notify=self.wake)
+        self.search_stale = False
+        self.show_stats = False
+        self.key_at = None
 
     def get_display_name_and_duration(self, filepath):
-        try:
-            audio = File(filepath)
-            title = ""
-            artist = ""
-            album = ""
-            duration = 0
-            if audio:
-                duration = int(audio.info.length)
-                if audio.tags:
-                    title = (
-                        audio.tags.get('TIT2', [""])[0]
-                        if 'TIT2' in audio.tags else
-                        audio.tags.get('title', [""])[0]
-                    )
-                    artist = (
-                        audio.tags.get('TPE1', [""])[0]
-                        if 'TPE1' in audio.tags else
-                        audio.tags.get('artist', [""])[0]
-                    )
-                    album = (
-                        audio.tags.get('TALB', [""])[0]
-                        if 'TALB' in audio.tags else
-                        audio.tags.get('album', [""])[0]
-                    )
-            minutes = duration // 60
-            seconds = duration % 60
-            timestamp = f"{minutes:02}:{seconds:02}"
-            if title and artist:
-                name = f"{artist} - {title}"
-            elif title:
-                name = title
-            elif artist:
-                name = artist
-            else:
-                name = os.path.splitext(os.path.basename(filepath))[0]
-            return name, timestamp, album
-        except Exception:
-            return os.path.splitext(os.path.basename(filepath))[0], "--:--", None
+        return metadata.get_display_name_and_duration(filepath)
+
+    def pane_entries(self):
+        return self.artists if self.view_mode == 4 else self.albums
+
+    def selected_entry(self):
+        entries = self.pane_entries()
+        if self.album_view_selected < len(entries):
+            return entries[self.album_view_selected]
+        return None
+
+    def pane_items(self):
+        entry = self.selected_entry()
+        if entry is None:
+            return []
+        return entry.albums if self.view_mode == 4 else entry.songs
+
+    def open_album(self, album):
+        self.view_mode = 3
+        self.album_view_selected = bisect_left(self.albums, album_key(album), key=album_key)
+        self.scroll_offset = self.album_view_selected
+        self.album_songs_scroll = 0
+        self.album_song_selected = 0
+        self.album_column = 1
 
     def get_current_names(self):
         if self.view_mode == 2:
             return [self.get_display_name_and_duration(song)[0] for song in self.queue_list]
         elif self.view_mode == 3:
-            selected_album = self.album_names[self.album_view_selected] if self.album_names else None
-            if selected_album:
-                return [self.get_display_name_and_duration(song)[0] for song in self.albums[selected_album]]
+            album = self.selected_entry()
+            return album.labels if album else []
+        elif self.view_mode == 4:
             return []
         else:
             return self.display_names
 
+    def get_current_fields(self):
+        if self.view_mode == 2:
+            indices = [self.tracks.position(song) for song in self.queue_list]
+            return {
+                field: [None if i is None else values[i] for i in indices]
+                for field, values in self.track_fields.items()
+            }
+        return self.track_fields
+
+    def start_search(self, query):
+        self.search_stale = False
+        self.search_worker.submit(query, self.get_current_names(), self.get_current_fields())
+
     def get_current_songs(self):
         if self.view_mode == 2:
             return self.queue_list
         elif self.view_mode == 3:
-            selected_album = self.album_names[self.album_view_selected] if self.album_names else None
-            if selected_album:
-                return self.albums[selected_album]
+            return self.pane_items()
+        elif self.view_mode == 4:
             return []
         else:
             return self.playlist
 
+    def get_current_count(self):
+        if self.view_mode == 1:
+            return len(self.display_names)
+        return len(self.get_current_songs())
+
+    def get_current_name(self, idx):
+        if self.view_mode == 1:
+            return self.display_names[idx]
+        return self.get_display_name_and_duration(self.get_current_songs()[idx])[0]
+
+    def relayout(self, max_y, max_x, force_redraw=False):
+        if force_redraw or max_x != self.screen_size[1]:
+            self.screen_rows = {}
+        else:
+            for y in [y for y in self.screen_rows if y >= max_y - 3]:
+                del self.screen_rows[y]
+        self.screen_size = (max_y, max_x)
+
+    def draw_row(self, y, x, width, text, attr=0):
+        text = text[:width].ljust(width)
+        row = self.screen_rows.setdefault(y, {})
+        if row.get(x) == (text, attr):
+            return
+        for other in list(row):
+            if other != x and other < x + width and x < other + len(row[other][0]):
+                del row[other]
+        try:
+            if attr:
+                self.stdscr.attron(attr)
+            self.stdscr.addstr(y, x, text)
+        except curses.error:
+            pass
+        finally:
+            if attr:
+                self.stdscr.attroff(attr)
+        row[x] = (text, attr)
+        self.screen_dirty = True
+
     def display_menu(self, display_names=None, command_input="", force_redraw=False, search_mode=False, filtered_indices=None, search_selected=0):
+        started = time.perf_counter()
         max_y, max_x = self.stdscr.getmaxyx()
         max_songs = max(0, max_y - 4)
         if not hasattr(self, 'colors_initialized'):
@@ -138,12 +185,15 @@ class CLI:
             curses.init_pair(2, curses.COLOR_BLACK, curses.COLOR_WHITE)
             curses.init_pair(3, curses.COLOR_GREEN, curses.COLOR_BLACK)
             self.colors_initialized = True
+        if force_redraw or (max_y, max_x) != self.screen_size:
+            self.relayout(max_y, max_x, force_redraw)
         now_playing = ""
         playback_pos = ""
-        if self.current_song_path and self.current_song_path in self.playlist:
-            song_index = self.playlist.index(self.current_song_path)
-            name = self.display_names[song_index]
-            timestamp = self.durations[song_index]
+        song_index = self.tracks.position(self.current_song_path)
+        if song_index is not None:
+            track = self.tracks.track(song_index)
+            name = track.name
+            timestamp = metadata.format_duration(track.duration)
             try:
                 pos_seconds = int(self.player.get_pos())
             except Exception:
@@ -153,7 +203,9 @@ class CLI:
             playback_pos = f"{pos_min:02}:{pos_sec:02}"
             status_icon = "PAUSED" if not self.player.playing else "PLAYING"
             now_playing = f" | {status_icon} {name} [{playback_pos}/{timestamp}] | Vol:{int(self.player.get_volume()*100)}%"
-        if self.view_mode == 3:
+        if self.view_mode == 4:
+            view_label = "Artists"
+        elif self.view_mode == 3:
             view_label = "Albums"
         elif self.view_mode == 2:
             view_label = f"Queue ({len(self.queue_list)})"
@@ -161,83 +213,47 @@ class CLI:
             view_label = f"Library ({len(self.playlist)})"
         shuffle_icon = "ON" if self.shuffle else "OFF"
         repeat_icon = "ON" if self.repeat else "OFF"
-        top_bar = f" {view_label}{now_playing} | Shuffle:{shuffle_icon} | Repeat:{repeat_icon}"
-        if top_bar != self.last_top_bar or force_redraw:
-            self.stdscr.attron(curses.color_pair(1))
-            try:
-                self.stdscr.addstr(0, 0, top_bar[:max_x].ljust(max_x))
-            except curses.error:
-                pass
-            self.stdscr.attroff(curses.color_pair(1))
-            self.last_top_bar = top_bar
+        top_bar = f" {view_label}{now_playing} | Shuffle:{shuffle_icon} | Repeat:{repeat_icon}{self.scan_progress()}"
+        self.draw_row(0, 0, max_x, top_bar, curses.color_pair(1))
         if self.version_message:
-            self.stdscr.attron(curses.color_pair(3))
-            try:
-                self.stdscr.addstr(max_y - 3, 0, f"Muse v{self.version_message} - Press any key to continue".ljust(max_x))
-            except curses.error:
-                pass
-            self.stdscr.attroff(curses.color_pair(3))
-        elif command_input != self.last_command_input or force_redraw:
-            try:
-                self.stdscr.addstr(max_y - 3, 0, command_input[:max_x].ljust(max_x))
-            except curses.error:
-                pass
-            self.last_command_input = command_input
+            self.draw_row(max_y - 3, 0, max_x, f"Muse v{self.version_message} - Press any key to continue", curses.color_pair(3))
+        else:
+            self.draw_row(max_y - 3, 0, max_x, command_input)
         if self.error_message:
-            self.stdscr.attron(curses.color_pair(3))
-            try:
-                self.stdscr.addstr(max_y - 2, 0, f"Error: {self.error_message}".ljust(max_x))
-            except curses.error:
-                pass
-            self.stdscr.attroff(curses.color_pair(3))
+            self.draw_row(max_y - 2, 0, max_x, f"Error: {self.error_message}", curses.color_pair(3))
         else:
-            try:
-                self.stdscr.addstr(max_y - 2, 0, "".ljust(max_x))
-            except curses.error:
-                pass
-        current_names = display_names if display_names is not None else self.get_current_names()
+            self.draw_row(max_y - 2, 0, max_x, "")
+        if display_names is not None:
+            name_at = display_names.__getitem__
+            count = len(display_names)
+        else:
+            name_at = self.get_current_name
+            count = self.get_current_count()
         selected_index = self.selected_index
         if search_mode and filtered_indices is not None:
-            filtered_names = [current_names[i] for i in filtered_indices if i < len(current_names)]
             selected_index = search_selected
             if selected_index < self.scroll_offset:
                 self.scroll_offset = selected_index
             elif selected_index >= self.scroll_offset + max_songs:
                 self.scroll_offset = selected_index - max_songs + 1
+            visible = [i for i in filtered_indices[self.scroll_offset:self.scroll_offset + max_songs] if i < count]
             for i in range(max_songs):
-                try:
-                    self.stdscr.move(1 + i, 0)
-                    self.stdscr.clrtoeol()
-                except curses.error:
-                    pass
-            visible_names = filtered_names[self.scroll_offset:self.scroll_offset + max_songs]
-            for i, name in enumerate(visible_names):
                 idx = self.scroll_offset + i
-                try:
-                    if idx == selected_index:
-                        self.stdscr.attron(curses.color_pair(2))
-                        self.stdscr.addstr(1 + i, 0, name[:max_x].ljust(max_x))
-                        self.stdscr.attroff(curses.color_pair(2))
-                    else:
-                        self.stdscr.addstr(1 + i, 0, name[:max_x].ljust(max_x))
-                except curses.error:
-                    pass
-            self.last_display_names = filtered_names[:]
-            self.last_selected = selected_index
-            self.last_scroll_offset = self.scroll_offset
-        elif self.view_mode == 3:
+                if i < len(visible):
+                    attr = curses.color_pair(2) if idx == selected_index else 0
+                    self.draw_row(1 + i, 0, max_x, name_at(visible[i]), attr)
+                else:
+                    self.draw_row(1 + i, 0, max_x, "")
+        elif self.view_mode in (3, 4):
             left_width = max_x // 2
             right_width = max_x - left_width
-            album_names = self.album_names
+            entries = self.pane_entries()
             selected_index = self.album_view_selected
-            selected_album = album_names[selected_index] if album_names else None
-            album_songs = []
-            album_song_names = []
-            if selected_album:
-                for song in self.albums[selected_album]:
-                    name, timestamp, _ = self.get_display_name_and_duration(song)
-                    album_songs.append(song)
-                    album_song_names.append(f"{name} [{timestamp}]")
+            entry = self.selected_entry()
+            if entry is None:
+                items = []
+            else:
+                items = entry.albums if self.view_mode == 4 else entry.labels
             if self.album_column == 0:
                 if selected_index < self.scroll_offset:
                     self.scroll_offset = selected_index
@@ -249,248 +265,234 @@ class CLI:
                 elif self.album_song_selected >= self.album_songs_scroll + max_songs:
                     self.album_songs_scroll = self.album_song_selected - max_songs + 1
             for i in range(max_songs):
-                try:
-                    self.stdscr.move(1 + i, 0)
-                    self.stdscr.clrtoeol()
-                except curses.error:
-                    pass
                 idx = self.scroll_offset + i
-                if idx < len(album_names):
-                    album_track_count = len(self.albums[album_names[idx]])
-                    track_label = "track" if album_track_count == 1 else "tracks"
-                    album_text = f"Album: {album_names[idx]} ({album_track_count} {track_label})"
-                    try:
-                        if idx == selected_index and self.album_column == 0:
-                            self.stdscr.attron(curses.color_pair(2))
-                            self.stdscr.addstr(1 + i, 0, album_text[:left_width].ljust(left_width))
-                            self.stdscr.attroff(curses.color_pair(2))
-                        else:
-                            self.stdscr.addstr(1 + i, 0, album_text[:left_width].ljust(left_width))
-                    except curses.error:
-                        pass
-            for i in range(max_songs):
+                if idx < len(entries):
+                    attr = curses.color_pair(2) if idx == selected_index and self.album_column == 0 else 0
+                    self.draw_row(1 + i, 0, left_width, entries[idx].label, attr)
+                else:
+                    self.draw_row(1 + i, 0, left_width, "")
                 song_idx = self.album_songs_scroll + i
-                if song_idx < len(album_song_names):
-                    song_text = f"{song_idx + 1:2}. {album_song_names[song_idx]}"
-                    try:
-                        if song_idx == self.album_song_selected and self.album_column == 1:
-                            self.stdscr.attron(curses.color_pair(2))
-                            self.stdscr.addstr(1 + i, left_width, song_text[:right_width].ljust(right_width))
-                            self.stdscr.attroff(curses.color_pair(2))
-                        else:
-                            self.stdscr.addstr(1 + i, left_width, song_text[:right_width].ljust(right_width))
-                    except curses.error:
-                        pass
-            self.last_display_names = album_names[:]
-            self.last_selected = selected_index
-            self.last_scroll_offset = self.scroll_offset
+                if song_idx < len(items):
+                    text = items[song_idx].label if self.view_mode == 4 else items[song_idx]
+                    attr = curses.color_pair(2) if song_idx == self.album_song_selected and self.album_column == 1 else 0
+                    self.draw_row(1 + i, left_width, right_width, text, attr)
+                else:
+                    self.draw_row(1 + i, left_width, right_width, "")
         else:
             if selected_index < self.scroll_offset:
                 self.scroll_offset = selected_index
             elif selected_index >= self.scroll_offset + max_songs:
                 self.scroll_offset = selected_index - max_songs + 1
-            need_song_redraw = (
-                force_redraw or
-                current_names != self.last_display_names or
-                selected_index != self.last_selected or
-                self.scroll_offset != self.last_scroll_offset
-            )
-            if need_song_redraw:
-                for i in range(max_songs):
-                    try:
-                        self.stdscr.move(1 + i, 0)
-                        self.stdscr.clrtoeol()
-                    except curses.error:
-                        pass
-                visible_names = current_names[self.scroll_offset:self.scroll_offset + max_songs]
-                current_songs = self.get_current_songs()
-                for i, name in enumerate(visible_names):
-                    idx = self.scroll_offset + i
-                    if self.view_mode == 1:
-                        display_text = f"{idx + 1:3}. {name}"
-                        if idx < len(self.durations):
-                            display_text += f" [{self.durations[idx]}]"
-                    else:
-                        display_text = f"{idx + 1:2}. {name}"
-                    try:
-                        if idx == selected_index:
-                            self.stdscr.attron(curses.color_pair(2))
-                            self.stdscr.addstr(1 + i, 0, display_text[:max_x].ljust(max_x))
-                            self.stdscr.attroff(curses.color_pair(2))
-                        else:
-                            if idx < len(current_songs) and current_songs[idx] == self.current_song_path:
-                                self.stdscr.attron(curses.color_pair(3))
-                                self.stdscr.addstr(1 + i, 0, display_text[:max_x].ljust(max_x))
-                                self.stdscr.attroff(curses.color_pair(3))
-                            else:
-                                self.stdscr.addstr(1 + i, 0, display_text[:max_x].ljust(max_x))
-                    except curses.error:
-                        pass
-                self.last_display_names = current_names[:]
-                self.last_selected = selected_index
-                self.last_scroll_offset = self.scroll_offset
-        status = keybinding_helper_row(self.keybindings)
-        status += " | 1:Library 2:Queue 3:Albums"
-        if status != self.last_status or force_redraw:
+            current_songs = self.get_current_songs()
+            for i in range(max_songs):
+                idx = self.scroll_offset + i
+                if idx >= count:
+                    self.draw_row(1 + i, 0, max_x, "")
+                    continue
+                name = name_at(idx)
+                if self.view_mode == 1:
+                    display_text = f"{idx + 1:3}. {name}"
+                    if idx < len(self.durations):
+                        display_text += f" [{self.durations[idx]}]"
+                else:
+                    display_text = f"{idx + 1:2}. {name}"
+                if idx == selected_index:
+                    attr = curses.color_pair(2)
+                elif idx < len(current_songs) and current_songs[idx] == self.current_song_path:
+                    attr = curses.color_pair(3)
+                else:
+                    attr = 0
+                self.draw_row(1 + i, 0, max_x, display_text, attr)
+        if self.show_stats and max_songs:
+            lines = stats_lines(stats.snapshot())[:max_songs]
+            width = min(max_x, max(len(line) for line in lines) + 2)
+            for i, line in enumerate(lines):
+                self.draw_row(1 + i, max_x - width, width, f" {line}", curses.color_pair(1))
+        self.draw_row(max_y - 1, 0, max_x, self.status_line)
+        if self.screen_dirty:
             try:
-                self.stdscr.addstr(max_y - 1, 0, status[:max_x].ljust(max_x))
+                self.stdscr.noutrefresh()
+                curses.doupdate()
             except curses.error:
                 pass
-            self.last_status = status
-        try:
-            self.stdscr.refresh()
-        except curses.error:
-            pass
+            self.screen_dirty = False
+        stats.record("frame", time.perf_counter() - started)
 
-    def load_playlist(self, path):
-        path = os.path.expanduser(path)
-        if not path.strip():
-            self.display_names = ["[No music folder set. Use ':a <folder>' to add one.]"]
-            self.durations = [""]
-            self.playlist = []
-            self.error_message = "No music folder set."
-            return
-        cache_file = f"playlist_cache_{get_folder_hash(path)}.json"
-        try:
-            if os.path.exists(cache_file):
-                with open(cache_file, "r", encoding="utf-8") as f:
-                    cache = json.load(f)
-                self.playlist = cache.get("playlist", [])
-                self.display_names = cache.get("display_names", [])
-                self.durations = cache.get("durations", [])
-                self.albums = cache.get("albums", {})
-                self.album_names = cache.get("album_names", [])
-                self.error_message = ""
-                return
-            extensions = [
-                '*.mp3', '*.wav', '*.flac', '*.ogg', '*.aac', '*.m4a', '*.wma',
-                '*.aiff', '*.ape', '*.opus', '*.mpc', '*.spx', '*.wv', '*.tta',
-                '*.mp2', '*.mp1', '*.caf', '*.dsf', '*.dff', '*.au', '*.snd',
-                '*.oga', '*.mogg', '*.xm', '*.mod', '*.it', '*.s3m', '*.mtm', '*.umx'
-            ]
-            songs = []
-            for ext in extensions:
-                songs.extend(glob.glob(os.path.join(path, "**", ext), recursive=True))
-            self.playlist = sorted(songs)
-            self.display_names = []
-            self.durations = []
-            self.albums = {}
-            self.album_names = []
-            if not os.path.exists(path):
-                self.display_names = ["[Invalid folder: not found]"]
-                self.durations = [""]
-                self.playlist = []
-                self.error_message = "Music folder not found."
-                return
-            if not songs:
-                self.display_names = ["[No music files found in folder and subfolders]"]
-                self.durations = [""]
-                self.playlist = []
-                self.error_message = "No music files found."
-                return
-            for song in self.playlist:
-                name, timestamp, album = self.get_display_name_and_duration(song)
-                self.display_names.append(name)
-                self.durations.append(timestamp)
-                if album:
-                    if album not in self.albums:
-                        self.albums[album] = []
-                    self.albums[album].append(song)
-            self.album_names = sorted(list(self.albums.keys()))
-            self.error_message = ""
-            cache = {
-                "playlist": self.playlist,
-                "display_names": self.display_names,
-                "durations": self.durations,
-                "albums": self.albums,
-                "album_names": self.album_names
-            }
-            with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(cache, f)
-        except Exception as e:
-            self.display_names = ["[Error loading music folder]"]
-            self.durations = [""]
-            self.playlist = []
-            self.error_message = str(e)
+    def selected_song(self):
+        if self.view_mode == 1 and self.selected_index < len(self.playlist):
+            return self.playlist[self.selected_index]
+        return None
+
+    def restore_selection(self, selected):
+        if selected is not None:
+            self.selected_index = self.tracks.position(selected, min(self.selected_index, max(0, len(self.playlist) - 1)))
+        self.clamp_album_selection()
+
+    def follow_track(self, index):
+        self.selected_index = index
+
+    def clamp_album_selection(self):
+        entries = self.pane_entries()
+        if self.album_view_selected >= len(entries):
+            self.album_view_selected = max(0, len(entries) - 1)
+            self.album_song_selected = 0
+            self.album_songs_scroll = 0
+
+    def apply_scan_updates(self):
+        changed = super().apply_scan_updates()
+        if changed:
+            self.search_worker.invalidate()
+        return changed
+
+    def apply_watch_updates(self):
+        changed = super().apply_watch_updates()
+        if changed:
+            self.search_worker.invalidate()
+        return changed
+
+    def visible_songs(self, filtered_indices=None):
+        max_y, _ = self.stdscr.getmaxyx()
+        rows = max(0, max_y - 4)
+        if filtered_indices is not None:
+            songs = self.get_current_songs()
+            return [songs[i] for i in filtered_indices[self.scroll_offset:self.scroll_offset + rows] if i < len(songs)]
+        if self.view_mode == 3:
+            return self.get_current_songs()[self.album_songs_scroll:self.album_songs_scroll + rows]
+        return self.get_current_songs()[self.scroll_offset:self.scroll_offset + rows]
+
+    def scan_progress(self):
+        scanners = [scanner for scanner in self.scanners.values() if not scanner.done]
+        walking = [scanner for scanner in scanners if scanner.phase == "walk"]
+        parsing = [scanner for scanner in scanners if scanner.phase != "walk"]
+        text = ""
+        if walking:
+            text += f" | Scanning {sum(scanner.found for scanner in walking)} files"
+        if parsing:
+            parsed = sum(scanner.parsed for scanner in parsing)
+            total = sum(scanner.total for scanner in parsing)
+            text += f" | Tags {parsed}/{total} {sum(scanner.rate() for scanner in parsing):.0f}/s"
+            etas = [scanner.eta() for scanner in parsing]
+            if None not in etas:
+                eta = max(etas)
+                text += f" ETA {int(eta) // 60}:{int(eta) % 60:02}"
+        return text
+
+    def show_placeholder(self, text):
+        super().show_placeholder(text)
+        self.display_names = [text]
+        self.durations = [""]
 
     def refresh_playlist(self):
-        cache_file = f"playlist_cache_{get_folder_hash(self.music_folder)}.json"
-        if os.path.exists(cache_file):
-            os.remove(cache_file)
-        self.load_playlist(self.music_folder)
+        self.refresh_library()
         self.selected_index = 0
         self.scroll_offset = 0
 
-    def play_song(self, song_path):
+    def on_resize(self, signum=None, frame=None):
+        self.resized = True
+        self.wake()
+
+    def apply_resize(self):
+        self.resized = False
+        try:
+            size = os.get_terminal_size(sys.__stdout__.fileno())
+            curses.resizeterm(size.lines, size.columns)
+        except (OSError, AttributeError, curses.error):
+            pass
+
+    def next_timeout(self):
+        if self.wakeup_fds is None and self.search_worker.pending:
+            return 0.02
+        return super().next_timeout()
+
+    def wait_for_key(self, timeout):
+        key = self.stdscr.getch()
+        if key != -1:
+            return key
+        if self.wakeup_fds is None:
+            self.stdscr.timeout(int(timeout * 1000))
+            key = self.stdscr.getch()
+            self.stdscr.nodelay(True)
+            return key
         try:
-            self.player.stop()
-            self.player.load_song(song_path)
-            self.player.play()
-            self.current_song_path = song_path
-            if song_path in self.playlist:
-                self.current_index = self.playlist.index(song_path)
-                self.selected_index = self.current_index
-            self.last_top_bar = ""
-            self.error_message = ""
-        except Exception:
-            self.error_message = f"Failed to play: {os.path.basename(song_path)}"
+            ready, _, _ = select.select([sys.stdin, self.wakeup_fds[0]], [], [], timeout)
+        except (OSError, ValueError):
+            ready = []
+        if self.wakeup_fds[0] in ready:
+            try:
+                os.read(self.wakeup_fds[0], 4096)
+            except OSError:
+                pass
+        return self.stdscr.getch()
+
+    def wait_for_any_key(self):
+        self.stdscr.nodelay(False)
+        self.stdscr.getch()
+        self.stdscr.nodelay(True)
 
     def process_input(self):
         self.stdscr.nodelay(True)
         search_mode = False
         search_query = ""
         filtered_indices = None
-        last_draw = 0
-        redraw_interval = 0.05
         kb = self.keybindings
         command_mode = False
         command_buffer = ""
         quit_prompt = False
+        if hasattr(signal, "SIGWINCH"):
+            signal.signal(signal.SIGWINCH, self.on_resize)
         self.display_menu(force_redraw=True)
+        startup.mark("first frame")
         while True:
-            if self.current_song_path and self.player.is_song_finished():
-                if self.queue_list and self.queue_index < len(self.queue_list):
-                    next_song = self.queue_list[self.queue_index]
-                    self.play_song(next_song)
-                    self.queue_index += 1
-                else:
-                    if self.shuffle:
-                        if self.playlist:
-                            next_song = random.choice(self.playlist)
-                            self.play_song(next_song)
-                    else:
-                        if self.playlist and self.current_song_path in self.playlist:
-                            idx = self.playlist.index(self.current_song_path)
-                            next_idx = (idx + 1) % len(self.playlist)
-                            self.play_song(self.playlist[next_idx])
-            now = time.time()
-            need_redraw = now - last_draw > redraw_interval
-            if need_redraw:
-                if command_mode:
-                    command_input = command_buffer
-                elif quit_prompt:
-                    command_input = "Quit Muse? (y/n): "
-                else:
-                    command_input = f"/{search_query}" if search_mode else ""
-                self.display_menu(
-                    display_names=self.get_current_names(),
-                    command_input=command_input,
-                    search_mode=search_mode,
-                    filtered_indices=filtered_indices,
-                    search_selected=self.search_selected
-                )
-                last_draw = now
-            key = self.stdscr.getch()
+            if self.resized:
+                self.apply_resize()
+            self.poll_playback()
+            changed = self.apply_scan_updates()
+            changed = self.apply_watch_updates() or changed
+            if changed and search_mode:
+                self.search_stale = True
+            if self.search_stale and search_mode and not self.search_worker.pending:
+                self.start_search(search_query)
+            self.update_prefetch()
+            if search_mode:
+                results = self.search_worker.take()
+                if results is not None:
+                    filtered_indices = results
+                    if self.search_worker.error:
+                        self.error_message = self.search_worker.error
+                    if self.search_selected >= len(filtered_indices):
+                        self.search_selected = max(0, len(filtered_indices) - 1)
+            if command_mode:
+                command_input = command_buffer
+            elif quit_prompt:
+                command_input = "Quit Muse? (y/n): "
+            else:
+                command_input = f"/{search_query}" if search_mode else ""
+            self.display_menu(
+                command_input=command_input,
+                search_mode=search_mode,
+                filtered_indices=filtered_indices,
+                search_selected=self.search_selected
+            )
+            if self.key_at is not None:
+                stats.record("input_latency", time.perf_counter() - self.key_at)
+                self.key_at = None
+            self.dump_stats()
+            if self.scanners:
+                visible = self.visible_songs(filtered_indices if search_mode else None)
+                for scanner in list(self.scanners.values()):
+                    scanner.prioritize(visible)
+            key = self.wait_for_key(self.next_timeout())
             if key == -1:
-                time.sleep(0.01)
+                continue
+            self.key_at = time.perf_counter()
+            if key == curses.KEY_RESIZE:
+                if sys.platform == "win32":
+                    curses.resize_term(0, 0)
                 continue
             force_redraw = True
             if quit_prompt:
                 if key in (ord('y'), ord('Y')):
-                    self.config["volume"] = self.volume
-                    self.config["shuffle"] = self.shuffle
-                    self.config["repeat"] = self.repeat
-                    save_config(self.config)
+                    self.save_state()
                     break
                 elif key in (ord('n'), ord('N')):
                     quit_prompt = False
@@ -518,62 +520,40 @@ class CLI:
                         except curses.error:
                             pass
                         self.stdscr.refresh()
-                        while True:
-                            if self.stdscr.getch() != -1:
-                                break
-                            time.sleep(0.01)
+                        self.wait_for_any_key()
                         self.display_menu(force_redraw=True)
                         command_mode = False
                         command_buffer = ""
                         force_redraw = True
                         continue
                     elif cmd.startswith(":a "):
-                        folder = command_buffer[3:].strip()
-                        folder = os.path.expanduser(folder)
-                        if folder and os.path.exists(folder):
-                            self.music_folder = folder
-                            self.config["music_folder"] = folder
-                            save_config(self.config)
-                            self.load_playlist(self.music_folder)
-                            self.selected_index = 0
-                            self.scroll_offset = 0
-                            self.error_message = ""
-                        else:
-                            self.display_names = ["[Invalid folder: not found]"]
-                            self.durations = [""]
-                            self.playlist = []
-                            self.error_message = "Folder not found."
+                        self.add_folder(command_buffer[3:].strip())
+                    elif cmd.startswith(":d "):
+                        self.remove_folder(command_buffer[3:].strip())
                     elif cmd == ":refresh":
                         self.refresh_playlist()
+                    elif cmd == ":cancel":
+                        self.cancel_scan()
+                    elif cmd == ":stats":
+                        self.show_stats = not self.show_stats
                         self.error_message = ""
                     elif cmd == ":q":
-                        self.config["volume"] = self.volume
-                        self.config["shuffle"] = self.shuffle
-                        self.config["repeat"] = self.repeat
-                        save_config(self.config)
+                        self.save_state()
                         break
                     elif cmd in (":v", ":version"):
                         self.version_message = APP_VERSION
                         self.display_menu(force_redraw=True)
-                        while True:
-                            key2 = self.stdscr.getch()
-                            if key2 != -1:
-                                self.version_message = ""
-                                break
-                            time.sleep(0.01)
+                        self.wait_for_any_key()
+                        self.version_message = ""
                         self.error_message = ""
                     elif cmd == ":clear":
-                        self.queue_list = []
-                        self.queue_index = 0
+                        self.clear_queue()
                         self.error_message = ""
                     elif cmd.startswith(":remove "):
                         try:
                             num_str = command_buffer[8:].strip()
                             remove_index = int(num_str) - 1
-                            if 0 <= remove_index < len(self.queue_list):
-                                del self.queue_list[remove_index]
-                                if self.queue_index > remove_index:
-                                    self.queue_index -= 1
+                            if self.dequeue(remove_index):
                                 if self.selected_index >= len(self.queue_list) and self.queue_list:
                                     self.selected_index = len(self.queue_list) - 1
                                 elif not self.queue_list:
@@ -595,14 +575,13 @@ class CLI:
                     command_buffer += chr(key)
                 continue
             if search_mode:
-                if self.view_mode == 3:
+                if self.view_mode in (3, 4):
                     search_mode = False
                     search_query = ""
                     filtered_indices = None
                     self.search_selected = 0
                     continue
-                current_names = self.get_current_names()
-                filtered_indices = search(search_query, current_names)
+                previous_query = search_query
                 if key_match(key, kb["down"]):
                     if filtered_indices and self.search_selected < len(filtered_indices) - 1:
                         self.search_selected += 1
@@ -634,6 +613,8 @@ class CLI:
                 elif 32 <= key <= 126:
                     search_query += chr(key)
                     self.search_selected = 0
+                if search_mode and search_query != previous_query:
+                    self.start_search(search_query)
                 if filtered_indices:
                     if self.search_selected >= len(filtered_indices):
                         self.search_selected = max(0, len(filtered_indices) - 1)
@@ -644,18 +625,19 @@ class CLI:
                 quit_prompt = True
                 continue
             elif key_match(key, kb.get("search", [])):
-                if self.view_mode == 3:
+                if self.view_mode in (3, 4):
                     continue
                 search_mode = True
                 search_query = ""
                 filtered_indices = None
                 self.search_selected = 0
+                self.start_search(search_query)
                 continue
             elif key_match(key, kb.get("shuffle", [])):
-                self.shuffle = not self.shuffle
+                self.set_shuffle(not self.shuffle)
                 continue
             elif key_match(key, kb.get("repeat", [])):
-                self.repeat = not self.repeat
+                self.set_repeat(not self.repeat)
                 continue
             elif key_match(key, kb["next"]):
                 self.next_song()
@@ -664,17 +646,17 @@ class CLI:
             elif key_match(key, kb["play_pause"]):
                 self.toggle_play_pause()
             elif key_match(key, kb.get("volume_up", [])):
-                self.volume = min(1.0, self.volume + 0.05)
-                self.player.set_volume(self.volume)
+                self.set_volume(self.volume + 0.05)
             elif key_match(key, kb.get("volume_down", [])):
-                self.volume = max(0.0, self.volume - 0.05)
-                self.player.set_volume(self.volume)
+                self.set_volume(self.volume - 0.05)
             elif key_match(key, kb.get("fadeout", [])):
                 self.player.fadeout()
-            elif key_match(key, kb.get("seek_forward", [])) and self.view_mode != 3:
-                self.player.seek(self.seek_seconds)
-            elif key_match(key, kb.get("seek_backward", [])) and self.view_mode != 3:
-                self.player.seek(-self.seek_seconds)
+            elif key_match(key, kb.get("seek_forward", [])) and self.view_mode not in (3, 4):
+                if self.player.current_song and not self.player.seek(self.seek_seconds):
+                    self.error_message = "Seeking is not supported for this track."
+            elif key_match(key, kb.get("seek_backward", [])) and self.view_mode not in (3, 4):
+                if self.player.current_song and not self.player.seek(-self.seek_seconds):
+                    self.error_message = "Seeking is not supported for this track."
             elif key == ord(':'):
                 command_mode = True
                 command_buffer = ":"
@@ -690,8 +672,8 @@ class CLI:
                 self.scroll_offset = 0
                 force_redraw = True
                 continue
-            elif key == ord('3'):
-                self.view_mode = 3
+            elif key in (ord('3'), ord('4')):
+                self.view_mode = 3 if key == ord('3') else 4
                 self.album_view_selected = 0
                 self.scroll_offset = 0
                 self.album_songs_scroll = 0
@@ -699,18 +681,17 @@ class CLI:
                 self.album_column = 0
                 force_redraw = True
                 continue
-            elif self.view_mode == 3:
-                album_names = self.album_names
-                selected_album = album_names[self.album_view_selected] if album_names else None
-                album_songs = self.albums[selected_album] if selected_album else []
+            elif self.view_mode in (3, 4):
+                entries = self.pane_entries()
+                items = self.pane_items()
                 if key_match(key, kb["down"]):
                     if self.album_column == 0:
-                        if self.album_view_selected < len(album_names) - 1:
+                        if self.album_view_selected < len(entries) - 1:
                             self.album_view_selected += 1
                             self.album_songs_scroll = 0
                             self.album_song_selected = 0
                     else:
-                        if album_songs and self.album_song_selected < len(album_songs) - 1:
+                        if self.album_song_selected < len(items) - 1:
                             self.album_song_selected += 1
                 elif key_match(key, kb["up"]):
                     if self.album_column == 0:
@@ -728,14 +709,18 @@ class CLI:
                     if self.album_column == 1:
                         self.album_column = 0
                 elif key_match(key, kb["enter"]):
-                    if self.album_column == 1 and album_songs and self.album_song_selected < len(album_songs):
-                        song = album_songs[self.album_song_selected]
-                        self.play_song(song)
+                    if self.album_column == 1 and self.album_song_selected < len(items):
+                        if self.view_mode == 4:
+                            self.open_album(items[self.album_song_selected])
+                        else:
+                            self.play_song(items[self.album_song_selected])
                 elif key_match(key, kb.get("queue", [])):
-                    if self.album_column == 1 and album_songs and self.album_song_selected < len(album_songs):
-                        song = album_songs[self.album_song_selected]
-                        if song not in self.queue_list:
-                            self.queue_list.append(song)
+                    if self.album_column == 1 and self.album_song_selected < len(items):
+                        if self.view_mode == 4:
+                            for song in items[self.album_song_selected].songs:
+                                self.enqueue(song)
+                        else:
+                            self.enqueue(items[self.album_song_selected])
             elif self.view_mode == 2:
                 if key_match(key, kb["down"]):
                     if self.selected_index < len(self.queue_list) - 1:
@@ -748,17 +733,11 @@ class CLI:
                         song = self.queue_list[self.selected_index]
                         self.play_song(song)
                 elif key in (curses.KEY_DC, ord('d')):
-                    if self.queue_list and self.selected_index < len(self.queue_list):
-                        del self.queue_list[self.selected_index]
+                    if self.dequeue(self.selected_index):
                         if self.selected_index >= len(self.queue_list) and self.queue_list:
                             self.selected_index = len(self.queue_list) - 1
-                        if self.queue_index > self.selected_index:
-                            self.queue_index -= 1
                 elif key_match(key, kb.get("queue", [])):
                     if self.queue_list and self.selected_index < len(self.queue_list):
-                        song = self.queue_list[self.selected_index]
-                        if song not in self.queue_list:
-                            self.queue_list.append(song)
                         if self.selected_index < len(self.queue_list) - 1:
                             self.selected_index += 1
             elif key_match(key, kb["down"]):
@@ -774,53 +753,116 @@ class CLI:
                     self.play_song(song)
             elif key_match(key, kb.get("queue", [])):
                 if self.view_mode == 1 and self.playlist and self.selected_index < len(self.playlist):
-                    song = self.playlist[self.selected_index]
-                    if song not in self.queue_list:
-                        self.queue_list.append(song)
+                    self.enqueue(self.playlist[self.selected_index])
                     if self.selected_index < len(self.playlist) - 1:
                         self.selected_index += 1
 
+class RemoteCLI(CLI):
+    def __init__(self, stdscr, config, client):
+        self.client = client
+        super().__init__(stdscr, dict(config, prefetch_tracks=0, watch_library=False), RemotePlayer(self.request))
+        self.library_generation = None
+        self.scan_library = False
+        self.sync()
+
+    def request(self, command, argument=""):
+        try:
+            reply = self.client.request(command, argument)
+        except (OSError, ValueError) as e:
+            reply = {"ok": False, "error": f"Lost connection to the Muse daemon: {e}"}
+        if not reply["ok"]:
+            self.error_message = reply["error"]
+        return reply
+
+    def sync(self):
+        status = self.request("status")
+        if not status["ok"]:
+            return
+        self.player.update(status)
+        self.queue_list = status["queue"]
+        self.queue_index = status["queue_index"]
+        self.shuffle = status["shuffle"]
+        self.repeat = status["repeat"]
+        self.volume = status["volume"]
+        if status["library"] != self.library_generation:
+            reload = self.library_generation is not None
+            self.library_generation = status["library"]
+            if reload:
+                self.load_library()
+                self.search_stale = True
+        if status["song"] != self.current_song_path:
+            self.current_song_path = status["song"]
+            song_index = self.tracks.position(self.current_song_path)
+            if song_index is not None:
+                self.follow_track(song_index)
+
+    def poll_playback(self):
+        self.sync()
+
+    def enqueue(self, song):
+        self.request("enqueue", song)
+        self.sync()
+
+    def dequeue(self, index):
+        reply = self.request("dequeue", str(index + 1))
+        self.sync()
+        return reply["ok"]
+
+    def clear_queue(self):
+        self.request("clear")
+        self.sync()
+
+    def set_volume(self, volume):
+        super().set_volume(volume)
+        self.request("volume", f"{self.volume:.2f}")
+
+    def set_shuffle(self, shuffle):
+        self.shuffle = shuffle
+        self.request("shuffle", "on" if shuffle else "off")
+
+    def set_repeat(self, repeat):
+        self.repeat = repeat
+        self.request("repeat", "on" if repeat else "off")
+
     def next_song(self):
-        if self.playlist:
-            if self.shuffle:
-                song = self.playlist[random.randint(0, len(self.playlist) - 1)]
-            else:
-                if self.current_song_path and self.current_song_path in self.playlist:
-                    current_idx = self.playlist.index(self.current_song_path)
-                    next_idx = (current_idx + 1) % len(self.playlist)
-                else:
-                    next_idx = 0
-                song = self.playlist[next_idx]
-            self.selected_index = self.playlist.index(song)
-            self.play_song(song)
+        self.request("next")
+        self.sync()
 
     def prev_song(self):
-        if self.playlist:
-            if self.shuffle:
-                song = self.playlist[random.randint(0, len(self.playlist) - 1)]
-            else:
-                if self.current_song_path and self.current_song_path in self.playlist:
-                    current_idx = self.playlist.index(self.current_song_path)
-                    prev_idx = (current_idx - 1) % len(self.playlist)
-                else:
-                    prev_idx = 0
-                song = self.playlist[prev_idx]
-            self.selected_index = self.playlist.index(song)
-            self.play_song(song)
-
-    def toggle_play_pause(self):
-        if self.player.playing:
-            self.player.pause()
-        else:
-            self.player.unpause()
+        self.request("prev")
+        self.sync()
+
+    def refresh_library(self):
+        self.request("refresh")
+        super().refresh_library()
 
-def main(stdscr):
+    def add_folder(self, folder):
+        self.error_message = "Music folders are managed by the daemon."
+
+    def remove_folder(self, folder):
+        self.error_message = "Music folders are managed by the daemon."
+
+    def save_state(self):
+        pass
+
+def main(stdscr, client=None):
     config = load_config()
     curses.curs_set(0)
     stdscr.keypad(True)
-    cli = CLI(stdscr, config)
-    cli.load_playlist(cli.music_folder)
+    cli = RemoteCLI(stdscr, config, client) if client else CLI(stdscr, config)
+    cli.load_library()
     cli.process_input()
+    cli.close()
 
 if __name__ == "__main__":
-    curses.wrapper(main)
\ No newline at end of file
+    multiprocessing.freeze_support()
+    client = None
+    if "--attach" in sys.argv:
+        try:
+            client = Client(socket_argument(sys.argv, load_config()))
+        except OSError as e:
+            print(f"muse: cannot attach to the daemon: {e}", file=sys.stderr)
+            sys.exit(1)
+    curses.wrapper(main, client)
+    if "--timings" in sys.argv:
+        startup.report()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import startup
+
+File = None
+
+def _tag(tags, id3_key, key):
+    if id3_key in tags:
+        return tags.get(id3_key, [""])[0]
+    return tags.get(key, [""])[0]
+
+def _number(value):
+    try:
+        return max(0, int(str(value).split("/")[0].strip()))
+    except ValueError:
+        return 0
+
+def format_duration(duration):
+    if duration is None:
+        return "--:--"
+    minutes = duration // 60
+    seconds = duration % 60
+    return f"{minutes:02}:{seconds:02}"
+
+def read_tags(filepath):
+    global File
+    if File is None:
+        from mutagen import File
+        startup.mark("import mutagen")
+    fallback = os.path.splitext(os.path.basename(filepath))[0]
+    try:
+        audio = File(filepath)
+        title = ""
+        artist = ""
+        album = ""
+        album_artist = ""
+        disc = 0
+        number = 0
+        duration = 0
+        length = None
+        if audio:
+            length = audio.info.length
+            duration = int(length)
+            if audio.tags:
+                title = _tag(audio.tags, 'TIT2', 'title')
+                artist = _tag(audio.tags, 'TPE1', 'artist')
+                album = _tag(audio.tags, 'TALB', 'album')
+                album_artist = _tag(audio.tags, 'TPE2', 'albumartist')
+                disc = _number(_tag(audio.tags, 'TPOS', 'discnumber'))
+                number = _number(_tag(audio.tags, 'TRCK', 'tracknumber'))
+        title = str(title) if title else ""
+        artist = str(artist) if artist else ""
+        album = str(album) if album else ""
+        album_artist = str(album_artist) if album_artist else ""
+        if title and artist:
+            name = f"{artist} - {title}"
+        elif title:
+            name = title
+        elif artist:
+            name = artist
+        else:
+            name = fallback
+        return {
+            "name": name, "title": title, "artist": artist, "album": album, "duration": duration,
+            "album_artist": album_artist, "disc": disc, "number": number, "length": length
+        }
+    except Exception:
+        return {
+            "name": fallback, "title": "", "artist": "", "album": None, "duration": None,
+            "album_artist": "", "disc": 0, "number": 0, "length": None
+        }
+
+def _mtime(filepath):
+    try:
+        return os.stat(filepath).st_mtime_ns
+    except OSError:
+        return None
+
+class MetadataCache:
+    def __init__(self, maxsize=4096, revalidate=5.0):
+        self.maxsize = maxsize
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filepath):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry and now - entry[2] < self.revalidate:
+                self._entries.move_to_end(filepath)
+                self.hits += 1
+                return entry[1]
+        mtime = _mtime(filepath)
+        with self._lock:
+            if entry and entry[0] == mtime:
+                self._entries[filepath] = (mtime, entry[1], now)
+                self._entries.move_to_end(filepath)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        info = read_tags(filepath)
+        self.put(filepath, mtime, info)
+        return info
+
+    def put(self, filepath, mtime, info):
+        with self._lock:
+            self._entries[filepath] = (mtime, info, time.monotonic())
+            self._entries.move_to_end(filepath)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries)
+            }
+
+    def invalidate(self, filepath=None):
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(filepath, None)
+
+cache = MetadataCache()
+
+def get_info(filepath):
+    return cache.get(filepath)
+
+def get_display_name_and_duration(filepath):
+    info = cache.get(filepath)
+    return info["name"], format_duration(info["duration"]), info["album"]
+
+def default_workers():
+    return min(32, (os.cpu_count() or 1) + 4)
+
+def open_pool(workers=0, executor="thread"):
+    if workers <= 0:
+        workers = default_workers()
+    if workers <= 1:
+        return None, 1
+    if executor == "process":
+        try:
+            return ProcessPoolExecutor(max_workers=workers), workers
+        except (OSError, NotImplementedError):
+            pass
+    return ThreadPoolExecutor(max_workers=workers), workers
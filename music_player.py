@@ -1,104 +1,262 @@
 import os
 os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
-import pygame
-from mutagen import File
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 import time
+import threading
+from collections import deque
+import metadata
+import startup
+
+pygame = None
+
+def track_length(path):
+    info = metadata.get_info(path)
+    return info.get("length") or info["duration"] or 0
 
 class MusicPlayer:
     def __init__(self):
+        self.end_event = None
+        self.gapless = False
+        self.ready = threading.Event()
+        self.init_error = None
+        self.volume = 1.0
+        self.current_song = None
+        self.queued_song = None
+        self.ended = None
+        self.expected_end = None
+        self.pending_transition = None
+        self.transitions = deque(maxlen=100)
+        self.playing = False
+        self.length = 0
+        self.offset = 0.0
+        self.base_ms = 0
+        threading.Thread(target=self.init_audio, daemon=True).start()
+
+    def init_audio(self):
+        global pygame
+        try:
+            import pygame
+            startup.mark("import pygame")
+        except Exception as e:
+            self.init_error = e
+            self.ready.set()
+            return
         try:
             pygame.mixer.init()
         except Exception:
             pass
-        self.current_song = None
-        self.playing = False
-        self.start_time = 0
-        self.pause_time = 0
+        startup.mark("mixer init")
+        try:
+            pygame.display.init()
+            self.end_event = pygame.USEREVENT + 1
+            pygame.mixer.music.set_endevent(self.end_event)
+        except Exception:
+            self.end_event = None
+        self.gapless = self.end_event is not None
+        self.ready.set()
+        try:
+            pygame.mixer.music.set_volume(self.volume)
+        except Exception:
+            pass
+
+    def wait_ready(self):
+        self.ready.wait()
+        if self.init_error is not None:
+            raise RuntimeError(f"Audio unavailable: {self.init_error}")
+
+    @property
+    def audio_ready(self):
+        return self.ready.is_set() and self.init_error is None
+
+    def clear_end_events(self):
+        if self.end_event is not None:
+            pygame.event.clear(self.end_event)
 
     def load_song(self, song_path):
+        self.wait_ready()
+        self.clear_end_events()
+        self.queued_song = None
+        self.expected_end = None
         if os.path.exists(song_path):
             pygame.mixer.music.load(song_path)
             self.current_song = song_path
-            self.start_time = 0
-            self.pause_time = 0
+            self.length = track_length(song_path)
+            self.offset = 0.0
+            self.base_ms = 0
         else:
             self.current_song = None
+            self.length = 0
 
     def play(self):
         if self.current_song:
             pygame.mixer.music.play()
             self.playing = True
-            self.start_time = time.time() - self.pause_time
+            self.offset = 0.0
+            self.base_ms = 0
+            if self.ended is not None:
+                self.pending_transition = (False,) + self.ended
+                self.ended = None
 
     def stop(self):
-        pygame.mixer.music.stop()
+        if self.audio_ready:
+            pygame.mixer.music.stop()
+            self.clear_end_events()
+        self.queued_song = None
+        self.pending_transition = None
+        self.expected_end = None
         self.playing = False
-        self.start_time = 0
-        self.pause_time = 0
+        self.offset = 0.0
+        self.base_ms = 0
 
     def pause(self):
         if self.playing:
             pygame.mixer.music.pause()
             self.playing = False
-            self.pause_time = time.time() - self.start_time
 
     def unpause(self):
-        if not self.playing:
+        if not self.playing and self.current_song:
             pygame.mixer.music.unpause()
             self.playing = True
-            self.start_time = time.time() - self.pause_time
 
     def fadeout(self, ms=2000):
-        pygame.mixer.music.fadeout(ms)
+        if self.audio_ready:
+            pygame.mixer.music.fadeout(ms)
         self.playing = False
 
     def set_volume(self, volume):
-        pygame.mixer.music.set_volume(volume)
+        self.volume = volume
+        if self.audio_ready:
+            pygame.mixer.music.set_volume(volume)
 
     def get_volume(self):
-        return pygame.mixer.music.get_volume()
+        if self.audio_ready:
+            return pygame.mixer.music.get_volume()
+        return self.volume
 
     def queue_song(self, song_path):
+        if song_path == self.queued_song:
+            return True
         if os.path.exists(song_path):
             pygame.mixer.music.queue(song_path)
+            self.queued_song = song_path
+            return True
+        return False
+
+    def record_transition(self, gapless, gap_ms, latency_ms):
+        self.transitions.append((gapless, gap_ms, latency_ms))
+
+    def track_end(self, now):
+        if not self.playing or not self.length or self.pending_transition:
+            return
+        remaining = self.time_remaining()
+        if remaining is not None:
+            self.expected_end = now + max(0.0, remaining)
+
+    def check_transition(self, now):
+        gapless, expected, detected = self.pending_transition
+        pos = pygame.mixer.music.get_pos()
+        if pos <= 0:
+            return
+        self.pending_transition = None
+        started = now - pos / 1000
+        if expected is None:
+            expected = started if gapless else detected
+        latency = detected - started if gapless else detected - expected
+        self.record_transition(gapless, max(0.0, started - expected) * 1000, max(0.0, latency) * 1000)
+
+    def transition_stats(self):
+        if not self.transitions:
+            return {"count": 0, "gapless": 0, "avg_gap_ms": 0.0, "max_gap_ms": 0.0, "avg_latency_ms": 0.0, "max_latency_ms": 0.0}
+        gaps = [t[1] for t in self.transitions]
+        latencies = [t[2] for t in self.transitions]
+        return {
+            "count": len(self.transitions),
+            "gapless": sum(1 for t in self.transitions if t[0]),
+            "avg_gap_ms": sum(gaps) / len(gaps),
+            "max_gap_ms": max(gaps),
+            "avg_latency_ms": sum(latencies) / len(latencies),
+            "max_latency_ms": max(latencies)
+        }
 
     def get_song_info(self):
         if self.current_song:
-            audio = File(self.current_song)
-            title = ""
-            artist = ""
-            duration = 0
-            if audio:
-                duration = int(audio.info.length)
-                if audio.tags:
-                    title = audio.tags.get('TIT2', [""])[0] if 'TIT2' in audio.tags else audio.tags.get('title', [""])[0]
-                    artist = audio.tags.get('TPE1', [""])[0] if 'TPE1' in audio.tags else audio.tags.get('artist', [""])[0]
+            info = metadata.get_info(self.current_song)
             return {
-                "title": str(title) if title else "",
-                "artist": str(artist) if artist else "",
-                "duration": duration
+                "title": info["title"],
+                "artist": info["artist"],
+                "duration": info["duration"] or 0
             }
         return {}
 
+    def get_elapsed(self):
+        if not self.current_song:
+            return 0.0
+        ms = pygame.mixer.music.get_pos()
+        if ms < 0:
+            return self.offset
+        return self.offset + max(0, ms - self.base_ms) / 1000
+
     def get_pos(self):
-        if self.playing and self.start_time > 0:
-            return int(time.time() - self.start_time)
-        elif self.pause_time > 0:
-            return int(self.pause_time)
-        else:
-            return 0
+        return int(self.get_elapsed())
 
     def seek(self, seconds):
-        if self.current_song:
-            audio = File(self.current_song)
-            song_length = int(audio.info.length) if audio and audio.info else 0
-            current_pos = self.get_pos()
-            new_pos = max(0, min(current_pos + seconds, song_length))
-            
-            if self.playing:
-                self.start_time = time.time() - new_pos
-            else:
-                self.pause_time = new_pos
+        if not self.current_song:
+            return False
+        new_pos = max(0.0, self.get_elapsed() + seconds)
+        if self.length:
+            new_pos = min(new_pos, self.length)
+        rewound = False
+        try:
+            if os.path.splitext(self.current_song)[1].lower() in (".mp3", ".mp2", ".mp1"):
+                pygame.mixer.music.rewind()
+                rewound = True
+            pygame.mixer.music.set_pos(new_pos)
+        except pygame.error:
+            if not rewound:
+                return False
+            new_pos = 0.0
+        self.base_ms = max(0, pygame.mixer.music.get_pos())
+        self.offset = new_pos
+        return True
+
+    def time_remaining(self):
+        if not self.current_song or not self.length:
+            return None
+        return self.length - self.get_elapsed()
 
     def is_song_finished(self):
-        return self.current_song and not pygame.mixer.music.get_busy()
\ No newline at end of file
+        return self.current_song and not pygame.mixer.music.get_busy()
+
+    def poll_end(self):
+        if not self.current_song:
+            return None
+        now = time.perf_counter()
+        if self.pending_transition and self.playing:
+            self.check_transition(now)
+        if self.end_event is None:
+            if self.is_song_finished():
+                self.end_detected(now)
+                return "ended"
+            self.track_end(now)
+            return None
+        if not pygame.event.get(self.end_event):
+            self.track_end(now)
+            return None
+        if self.queued_song and pygame.mixer.music.get_busy():
+            self.current_song = self.queued_song
+            self.queued_song = None
+            self.length = track_length(self.current_song)
+            self.offset = 0.0
+            self.base_ms = 0
+            self.playing = True
+            self.pending_transition = (True, self.expected_end, now)
+            self.expected_end = None
+            self.check_transition(now)
+            return "advanced"
+        self.queued_song = None
+        self.end_detected(now)
+        return "ended"
+
+    def end_detected(self, now):
+        self.ended = (self.expected_end, now)
+        self.expected_end = None
\ No newline at end of file
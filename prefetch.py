@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1 << 20
+MAX_WARM_ENTRIES = 64
+
+class Prefetcher:
+    def __init__(self, max_tracks=3, max_bytes=64 << 20):
+        self.max_tracks = max_tracks
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.candidates = ()
+        self.generation = 0
+        self._warm = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if self.max_tracks > 0 and self.max_bytes > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def update(self, paths):
+        if self._thread is None:
+            return
+        candidates = []
+        for path in paths:
+            if path and path not in candidates:
+                candidates.append(path)
+            if len(candidates) >= self.max_tracks:
+                break
+        candidates = tuple(candidates)
+        with self._lock:
+            if candidates == self.candidates:
+                return
+            self.candidates = candidates
+            self.generation += 1
+        self._wakeup.set()
+
+    def record_play(self, path):
+        with self._lock:
+            entry = self._warm.get(path)
+            if entry and entry[1] >= entry[2]:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bytes_read": self.bytes_read,
+                "warm": len(self._warm)
+            }
+
+    def _warmed(self, path, key):
+        with self._lock:
+            entry = self._warm.get(path)
+            return entry[1] if entry and entry[0] == key else 0
+
+    def _mark_warm(self, path, key, done, target):
+        with self._lock:
+            self._warm[path] = (key, done, target)
+            self._warm.move_to_end(path)
+            while len(self._warm) > MAX_WARM_ENTRIES:
+                self._warm.popitem(last=False)
+
+    def _run(self):
+        buffer = memoryview(bytearray(CHUNK_SIZE))
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                generation = self.generation
+                candidates = self.candidates
+            if not candidates:
+                continue
+            per_track = self.max_bytes // len(candidates)
+            for path in candidates:
+                if generation != self.generation:
+                    break
+                self._warm_file(path, per_track, buffer, generation)
+
+    def _warm_file(self, path, limit, buffer, generation):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        key = (st.st_size, st.st_mtime_ns)
+        limit = min(limit, st.st_size)
+        done = start = self._warmed(path, key)
+        if done >= limit:
+            return
+        try:
+            with open(path, "rb", buffering=0) as f:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), start, limit - start, os.POSIX_FADV_WILLNEED)
+                f.seek(start)
+                while done < limit:
+                    if generation != self.generation:
+                        break
+                    n = f.readinto(buffer[:min(CHUNK_SIZE, limit - done)])
+                    if not n:
+                        break
+                    done += n
+                    with self._lock:
+                        self.bytes_read += n
+        except OSError:
+            return
+        if done > start:
+            self._mark_warm(path, key, done, limit)
@@ -0,0 +1,325 @@
+import re
+import math
+import time
+import threading
+import stats
+import operator
+import unicodedata
+from array import array
+from itertools import compress, repeat
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+FUZZY_CUTOFF = 0.5
+COMMON_GRAM_SHARE = 0.05
+COMMON_GRAM_FLOOR = 5000
+MAX_CACHED_QUERIES = 256
+FIRST_CHUNK = 4096
+CHUNK_SIZE = 32768
+TEXT_FIELDS = ("artist", "title", "album")
+FILTER_PATTERN = re.compile(
+    r'(?:^|(?<=\s))(?:(artist|title|album):("[^"]*"|\S+)|(duration)(>=|<=|>|<|=)(\d+(?::\d{1,2})?))(?=\s|$)',
+    re.IGNORECASE
+)
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def parse_seconds(value):
+    if ":" in value:
+        minutes, seconds = value.split(":", 1)
+        return int(minutes) * 60 + int(seconds)
+    return int(value)
+
+def parse_query(query):
+    filters = []
+    for match in FILTER_PATTERN.finditer(query):
+        if match.group(1):
+            filters.append((match.group(1).lower(), ":", match.group(2).strip('"')))
+        else:
+            filters.append(("duration", match.group(4), parse_seconds(match.group(5))))
+    text = " ".join(FILTER_PATTERN.sub(" ", query).split())
+    return filters, text
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    def __init__(self, names, fields=None):
+        self.names = names
+        self.normalized = [normalize(name) for name in names]
+        self.postings = defaultdict(lambda: array("i"))
+        for i, name in enumerate(self.normalized):
+            if name:
+                for gram in trigrams(name):
+                    self.postings[gram].append(i)
+        self.postings.default_factory = None
+        fields = fields or {}
+        self.field_tokens = {}
+        for field in TEXT_FIELDS:
+            values = fields.get(field)
+            if values is None:
+                continue
+            tokens = defaultdict(set)
+            for i, value in enumerate(values):
+                if value:
+                    for word in normalize(value).split():
+                        tokens[word].add(i)
+            self.field_tokens[field] = (sorted(tokens), dict(tokens))
+        durations = fields.get("duration") or []
+        self.durations = sorted((d, i) for i, d in enumerate(durations) if d is not None)
+        self.duration_keys = [d for d, _ in self.durations]
+        self._results = {}
+        self._substring = {}
+
+    def _candidates(self, query):
+        candidates = range(len(self.names))
+        for end in range(len(query) - 1, 0, -1):
+            matches = self._substring.get(query[:end])
+            if matches is not None:
+                if len(matches) < len(candidates):
+                    candidates = matches
+                break
+        if len(query) >= 3:
+            grams = {query[i:i + 3] for i in range(len(query) - 2)}
+            ids = min((self.postings.get(gram, ()) for gram in grams), key=len)
+            if len(ids) < len(candidates):
+                candidates = ids
+        return candidates
+
+    def _remember(self, cache, query, value):
+        if len(cache) >= MAX_CACHED_QUERIES:
+            cache.clear()
+        cache[query] = value
+
+    def _field_matches(self, field, value):
+        if field not in self.field_tokens:
+            return set()
+        tokens, postings = self.field_tokens[field]
+        matches = None
+        for word in normalize(value).split():
+            ids = set()
+            for j in range(bisect_left(tokens, word), len(tokens)):
+                if not tokens[j].startswith(word):
+                    break
+                ids |= postings[tokens[j]]
+            matches = ids if matches is None else matches & ids
+        return matches or set()
+
+    def _duration_matches(self, op, seconds):
+        keys = self.duration_keys
+        if op == ">":
+            rows = self.durations[bisect_right(keys, seconds):]
+        elif op == ">=":
+            rows = self.durations[bisect_left(keys, seconds):]
+        elif op == "<":
+            rows = self.durations[:bisect_left(keys, seconds)]
+        elif op == "<=":
+            rows = self.durations[:bisect_right(keys, seconds)]
+        else:
+            rows = self.durations[bisect_left(keys, seconds):bisect_right(keys, seconds)]
+        return {i for _, i in rows}
+
+    def search(self, query):
+        results = []
+        for results in self.iter_search(query):
+            pass
+        return results
+
+    def iter_search(self, query, cancelled=None):
+        filters, text = parse_query(query)
+        if not filters:
+            yield from self.iter_search_text(query, cancelled)
+            return
+        key = normalize(query)
+        cached = self._results.get(key)
+        if cached is not None:
+            yield cached
+            return
+        allowed = None
+        for field, op, value in filters:
+            if field == "duration":
+                ids = self._duration_matches(op, value)
+            else:
+                ids = self._field_matches(field, value)
+            allowed = ids if allowed is None else allowed & ids
+            if not allowed:
+                break
+        if not text:
+            results = sorted(allowed)
+            self._remember(self._results, key, results)
+            yield results
+            return
+        results = []
+        for results in self.iter_search_text(text, cancelled, allowed):
+            yield results
+        if not (cancelled and cancelled()):
+            self._remember(self._results, key, results)
+
+    def iter_search_text(self, query, cancelled=None, allowed=None):
+        if not query.strip():
+            yield list(range(len(self.names))) if allowed is None else sorted(allowed)
+            return
+        query = normalize(query)
+        cached = self._results.get(query) if allowed is None else None
+        if cached is not None:
+            yield cached
+            return
+        candidates = self._candidates(query)
+        if allowed is not None:
+            if len(allowed) < len(candidates):
+                candidates = sorted(allowed)
+            else:
+                candidates = [i for i in candidates if i in allowed]
+        names = self.normalized
+        word_query = " " + query
+        exact_matches = []
+        starts_with_matches = []
+        word_matches = []
+        substring_matches = []
+        matched = []
+        start = 0
+        size = FIRST_CHUNK
+        while start < len(candidates):
+            if start and cancelled and cancelled():
+                return
+            chunk = candidates[start:start + size]
+            start += size
+            size = min(CHUNK_SIZE, size * 2)
+            if isinstance(chunk, range):
+                texts = names[chunk.start:chunk.stop]
+            else:
+                texts = list(map(names.__getitem__, chunk))
+            found = list(map(operator.contains, texts, repeat(query)))
+            hits = list(compress(chunk, found))
+            texts = list(compress(texts, found))
+            exact = list(map(operator.eq, texts, repeat(query)))
+            starts = [text.startswith(query) for text in texts]
+            words = list(map(operator.contains, texts, repeat(word_query)))
+            matched += hits
+            exact_matches += compress(hits, exact)
+            starts_with_matches += compress(hits, map(operator.gt, starts, exact))
+            word_matches += compress(hits, map(operator.gt, words, starts))
+            substring_matches += compress(hits, map(operator.not_, map(operator.or_, starts, words)))
+            if start < len(candidates):
+                yield exact_matches + starts_with_matches + word_matches + substring_matches
+        results = exact_matches + starts_with_matches + word_matches + substring_matches
+        if allowed is None:
+            self._remember(self._substring, query, matched)
+        yield results
+        if cancelled and cancelled():
+            return
+        results = results + self._fuzzy(query, matched, allowed)
+        if allowed is None:
+            self._remember(self._results, query, results)
+        yield results
+
+    def fuzzy_scores(self, query, exclude=(), allowed=None):
+        grams = sorted(trigrams(query), key=lambda gram: len(self.postings.get(gram, ())))
+        needed = math.ceil(FUZZY_CUTOFF * len(grams))
+        common = max(COMMON_GRAM_FLOOR, int(COMMON_GRAM_SHARE * len(self.names)))
+        candidates = set()
+        for gram in grams[:len(grams) - needed + 1]:
+            ids = self.postings.get(gram, ())
+            if len(ids) > common:
+                break
+            candidates.update(ids)
+        if allowed is not None:
+            candidates = candidates & allowed if len(allowed) > common else set(allowed)
+        if not candidates:
+            return {}
+        candidates.difference_update(exclude)
+        scores = {}
+        for i in candidates:
+            padded = f"  {self.normalized[i]} "
+            count = sum(gram in padded for gram in grams)
+            if count >= needed:
+                scores[i] = count / len(grams)
+        return scores
+
+    def _fuzzy(self, query, matched, allowed=None):
+        scores = self.fuzzy_scores(query, matched, allowed)
+        return sorted(scores, key=lambda i: (-scores[i], len(self.normalized[i]), i))
+
+class SearchWorker:
+    def __init__(self, notify=None):
+        self.notify = notify
+        self.index = None
+        self.index_epoch = 0
+        self.generation = 0
+        self.pending = False
+        self.error = ""
+        self._request = None
+        self._results = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, query, names, fields=None):
+        with self._lock:
+            self.generation += 1
+            self.pending = True
+            self._request = (self.generation, query, names, fields, time.perf_counter())
+            self._results = None
+        self._wakeup.set()
+
+    def invalidate(self):
+        with self._lock:
+            self.index = None
+            self.index_epoch += 1
+
+    def take(self):
+        with self._lock:
+            results = self._results
+            self._results = None
+            return results
+
+    def _publish(self, generation, results, error=""):
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._results = results
+            self.error = error
+        if self.notify:
+            self.notify()
+        return True
+
+    def _finish(self, generation):
+        with self._lock:
+            if generation == self.generation:
+                self.pending = False
+        if self.notify:
+            self.notify()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                request = self._request
+                self._request = None
+            if request is None:
+                continue
+            generation, query, names, fields, submitted = request
+            cancelled = lambda: generation != self.generation
+            try:
+                index = self.index
+                if index is None or index.names is not names:
+                    epoch = self.index_epoch
+                    index = SearchIndex(names, fields)
+                    with self._lock:
+                        if epoch == self.index_epoch:
+                            self.index = index
+                for results in index.iter_search(query, cancelled):
+                    if not self._publish(generation, results):
+                        break
+            except Exception as e:
+                self.index = None
+                self._publish(generation, [], f"Search failed: {e}")
+            else:
+                if not cancelled():
+                    stats.record("search", time.perf_counter() - submitted)
+            self._finish(generation)
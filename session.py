@@ -0,0 +1,485 @@
+import os
+import sys
+import time
+import queue
+import random
+import platform
+import threading
+import stats
+import library
+import metadata
+from music_player import MusicPlayer
+from prefetch import Prefetcher
+from watcher import Watcher, SNAPSHOT_DELAY
+from tracks import TrackStore, ShardedStore
+from config import save_config
+
+OVERRUN_POLL = 0.25
+
+class Session:
+    def __init__(self, config, player=None, version=""):
+        self.player = player or MusicPlayer()
+        self.config = config
+        self.version = version
+        self.music_folders = []
+        for folder in config.get("music_folders", []):
+            folder = os.path.abspath(os.path.expanduser(folder))
+            if folder not in self.music_folders:
+                self.music_folders.append(folder)
+        self.seek_seconds = config.get("seek_seconds", 5)
+        self.scan_workers = config.get("scan_workers", 0)
+        self.scan_executor = config.get("scan_executor", "thread")
+        self.follow_symlinks = config.get("follow_symlinks", True)
+        self.watch_library = config.get("watch_library", True)
+        self.watch_poll_interval = config.get("watch_poll_interval", 30)
+        self.snapshot_delay = SNAPSHOT_DELAY
+        self.library_generation = 0
+        self.scan_library = True
+        metadata.cache.maxsize = config.get("metadata_cache_size", 4096)
+        self.tracks = ShardedStore()
+        self.set_library(self.tracks)
+        self.current_song_path = None
+        self.shuffle = config.get("shuffle", False)
+        self.repeat = config.get("repeat", False)
+        self.volume = config.get("volume", 1.0)
+        self.player.set_volume(self.volume)
+        self.queue_list = []
+        self.queue_index = 0
+        self.next_pick = (None, False)
+        self.next_key = None
+        self.scanners = {}
+        self.watchers = {}
+        self.deferred = {}
+        self.materialized = queue.Queue()
+        self.prefetcher = Prefetcher(config.get("prefetch_tracks", 3), config.get("prefetch_bytes", 64 << 20))
+        self.error_message = ""
+        self.wakeup_fds = None
+        if sys.platform != "win32":
+            self.wakeup_fds = os.pipe()
+            for fd in self.wakeup_fds:
+                os.set_blocking(fd, False)
+        self.stats_file = os.path.expanduser(config.get("stats_file", ""))
+        self.stats_interval = config.get("stats_interval", 60)
+        self.next_stats_dump = time.monotonic() + self.stats_interval
+        stats.register("scan", self.scan_stats)
+        stats.register("metadata_cache", metadata.cache.stats)
+        stats.register("prefetch", self.prefetcher.stats)
+        stats.register("transitions", self.player.transition_stats)
+
+    def selected_song(self):
+        return None
+
+    def restore_selection(self, selected):
+        pass
+
+    def follow_track(self, index):
+        pass
+
+    def load_library(self):
+        for root in self.music_folders:
+            self.load_root(root)
+        self.show_library_status()
+
+    def load_root(self, root):
+        self.stop_watcher(root)
+        scanner = self.scanners.pop(root, None)
+        if scanner:
+            scanner.cancel()
+        if not os.path.exists(root):
+            self.error_message = f"Music folder not found: {root}"
+            return
+        store = TrackStore.open(library.snapshot_path(root))
+        if store is not None:
+            self.apply_library(root, store)
+        if not self.scan_library:
+            return
+        self.scanners[root] = library.Scanner(
+            root, self.scan_workers, self.scan_executor, self.follow_symlinks,
+            notify=self.wake, generation=store.generation if store else None
+        )
+        self.scanners[root].start()
+
+    def refresh_library(self):
+        self.error_message = ""
+        self.load_library()
+
+    def show_library_status(self):
+        if self.playlist:
+            return
+        if not self.music_folders:
+            self.show_placeholder("[No music folder set. Use ':a <folder>' to add one.]")
+            self.error_message = "No music folder set."
+        elif self.scanners:
+            self.show_placeholder("[Scanning music folder...]")
+        elif self.error_message.startswith("Music folder not found"):
+            self.show_placeholder("[Invalid folder: not found]")
+        elif not self.error_message:
+            self.show_placeholder("[No music files found in folder and subfolders]")
+            self.error_message = "No music files found."
+
+    def add_folder(self, folder):
+        folder = os.path.abspath(os.path.expanduser(folder))
+        if not os.path.isdir(folder):
+            self.error_message = "Folder not found."
+            return
+        if folder in self.music_folders:
+            self.error_message = "Folder is already in the library."
+            return
+        prefix = os.path.join(folder, "")
+        for root in self.music_folders:
+            other = os.path.join(root, "")
+            if prefix.startswith(other) or other.startswith(prefix):
+                self.error_message = f"Folder overlaps {root}"
+                return
+        self.music_folders.append(folder)
+        self.config["music_folders"] = self.music_folders
+        save_config(self.config)
+        self.error_message = ""
+        self.load_root(folder)
+        self.show_library_status()
+
+    def remove_folder(self, folder):
+        folder = os.path.abspath(os.path.expanduser(folder))
+        if folder not in self.music_folders:
+            self.error_message = "Folder is not in the library."
+            return
+        self.stop_watcher(folder)
+        scanner = self.scanners.pop(folder, None)
+        if scanner:
+            scanner.cancel()
+        self.music_folders.remove(folder)
+        self.config["music_folders"] = self.music_folders
+        save_config(self.config)
+        selected = self.selected_song()
+        self.tracks.remove_shard(folder)
+        self.set_library(self.tracks)
+        self.restore_selection(selected)
+        self.error_message = ""
+        self.show_library_status()
+
+    def cancel_scan(self):
+        scanners = [scanner for scanner in self.scanners.values() if not scanner.done]
+        if scanners:
+            for scanner in scanners:
+                scanner.cancel()
+            self.error_message = "Library scan cancelled."
+        else:
+            self.error_message = "No library scan in progress."
+
+    def apply_scan_updates(self):
+        selected = self.selected_song()
+        changed = dirty = self.apply_materialized()
+        for root, scanner in list(self.scanners.items()):
+            while True:
+                try:
+                    message = scanner.updates.get_nowait()
+                except queue.Empty:
+                    break
+                kind = message[0]
+                if kind == "library":
+                    self.apply_library(root, message[1])
+                    changed = True
+                    dirty = False
+                elif kind == "tags":
+                    if self.apply_update(root, message):
+                        changed = dirty = True
+                elif kind == "error":
+                    self.error_message = message[1]
+                    if not self.playlist:
+                        self.show_placeholder("[Error loading music folder]")
+                elif kind == "done":
+                    del self.scanners[root]
+                    self.library_generation += 1
+                    if not scanner.cancelled and self.watch_library:
+                        self.watchers[root] = Watcher(
+                            root, self.follow_symlinks, self.watch_poll_interval, notify=self.wake,
+                            snapshot_delay=self.snapshot_delay
+                        )
+                        self.watchers[root].start()
+                    if not self.scanners:
+                        self.show_library_status()
+                    break
+        if dirty:
+            self.show_changes(selected)
+        return changed
+
+    def apply_library(self, root, store):
+        selected = self.selected_song()
+        self.tracks.set_shard(root, store)
+        self.set_library(self.tracks)
+        self.restore_selection(selected)
+
+    def apply_tags(self, items):
+        changed = False
+        for path, info in items:
+            changed = self.tracks.update(path, info) or changed
+        return changed
+
+    def apply_update(self, root, message):
+        if root in self.deferred:
+            self.deferred[root].append(message)
+            return False
+        store = self.tracks.get(root)
+        if store is not None and store.mapped is not None:
+            self.deferred[root] = [message]
+            threading.Thread(target=self.materialize, args=(root, store), daemon=True).start()
+            return False
+        if message[0] == "tags":
+            return self.apply_tags(message[1])
+        self.apply_changes(message[1], message[2])
+        return True
+
+    def materialize(self, root, store):
+        self.materialized.put((root, store, store.materialized()))
+        self.wake()
+
+    def apply_materialized(self):
+        applied = False
+        while True:
+            try:
+                root, store, copy = self.materialized.get_nowait()
+            except queue.Empty:
+                return applied
+            if self.tracks.get(root) is store:
+                self.tracks.set_shard(root, copy)
+            for message in self.deferred.pop(root, []):
+                self.apply_update(root, message)
+            applied = True
+
+    def stop_watcher(self, root=None):
+        for folder in [root] if root else list(self.watchers):
+            watcher = self.watchers.pop(folder, None)
+            if watcher:
+                watcher.stop()
+
+    def apply_watch_updates(self):
+        selected = self.selected_song()
+        changed = False
+        for root, watcher in list(self.watchers.items()):
+            while True:
+                try:
+                    message = watcher.updates.get_nowait()
+                except queue.Empty:
+                    break
+                if message[0] == "changes":
+                    changed = self.apply_update(root, message) or changed
+                elif message[0] == "snapshot":
+                    self.library_generation += 1
+                elif message[0] == "error":
+                    self.error_message = message[1]
+                    del self.watchers[root]
+                    break
+        if changed:
+            self.show_changes(selected)
+        return changed
+
+    def apply_changes(self, removed, updated):
+        for path in removed:
+            self.tracks.remove(path)
+        for path, info in updated:
+            self.tracks.insert(path, info)
+
+    def show_changes(self, selected):
+        self.set_library(self.tracks)
+        self.restore_selection(selected)
+        if self.playlist:
+            if self.error_message == "No music files found.":
+                self.error_message = ""
+        else:
+            self.show_placeholder("[No music files found in folder and subfolders]")
+            self.error_message = "No music files found."
+
+    def scan_stats(self):
+        scanners = [scanner for scanner in list(self.scanners.values()) if not scanner.done]
+        return {"active": len(scanners), "tracks_per_s": sum(scanner.rate() for scanner in scanners)}
+
+    def dump_stats(self, force=False):
+        if not self.stats_file:
+            return
+        now = time.monotonic()
+        if force or now >= self.next_stats_dump:
+            self.next_stats_dump = now + self.stats_interval
+            stats.dump(self.stats_file, version=self.version, host=platform.node())
+
+    def set_library(self, store):
+        self.tracks = store
+        self.playlist = store.column("path")
+        self.display_names = store.column("name")
+        self.durations = store.column("duration_label")
+        self.track_fields = store.fields()
+        self.albums = store.album_list()
+        self.artists = store.artist_list()
+
+    def show_placeholder(self, text):
+        self.set_library(self.tracks)
+
+    def play_song(self, song_path):
+        self.prefetcher.record_play(song_path)
+        try:
+            self.player.stop()
+            self.player.load_song(song_path)
+            self.player.play()
+            self.current_song_path = song_path
+            song_index = self.tracks.position(song_path)
+            if song_index is not None:
+                self.follow_track(song_index)
+            self.error_message = ""
+        except Exception:
+            self.error_message = f"Failed to play: {os.path.basename(song_path)}"
+
+    def pick_next_song(self):
+        if self.queue_list and self.queue_index < len(self.queue_list):
+            return self.queue_list[self.queue_index], True
+        if not self.playlist:
+            return None, False
+        if self.shuffle:
+            return random.choice(self.playlist), False
+        idx = self.tracks.position(self.current_song_path)
+        if idx is None:
+            return None, False
+        return self.playlist[(idx + 1) % len(self.playlist)], False
+
+    def plan_next(self):
+        upcoming = self.queue_list[self.queue_index] if self.queue_index < len(self.queue_list) else None
+        key = (self.current_song_path, upcoming, self.shuffle, id(self.playlist))
+        if key == self.next_key:
+            return
+        self.next_key = key
+        self.next_pick = self.pick_next_song()
+        song = self.next_pick[0]
+        if song and self.player.gapless and self.player.current_song:
+            try:
+                self.player.queue_song(song)
+            except Exception:
+                pass
+
+    def update_prefetch(self):
+        candidates = [self.next_pick[0] if self.next_key and self.next_key[0] == self.current_song_path else None]
+        candidates.extend(self.queue_list[self.queue_index:self.queue_index + self.prefetcher.max_tracks])
+        idx = self.tracks.position(self.current_song_path)
+        if idx is not None:
+            candidates.append(self.playlist[(idx + 1) % len(self.playlist)])
+        candidates.append(self.selected_song())
+        self.prefetcher.update(candidates)
+
+    def poll_playback(self):
+        if self.current_song_path:
+            ended = self.player.poll_end()
+            if ended == "advanced":
+                self.confirm_gapless_advance()
+            elif ended == "ended":
+                self.advance()
+            self.plan_next()
+
+    def advance(self):
+        song, from_queue = self.next_pick
+        if self.next_key is None or self.next_key[0] != self.current_song_path:
+            song, from_queue = self.pick_next_song()
+        if not song:
+            return
+        self.play_song(song)
+        if from_queue:
+            self.queue_index += 1
+
+    def confirm_gapless_advance(self):
+        song, from_queue = self.next_pick
+        if song != self.player.current_song:
+            song, from_queue = self.player.current_song, False
+        self.prefetcher.record_play(song)
+        self.current_song_path = song
+        if from_queue:
+            self.queue_index += 1
+        song_index = self.tracks.position(song)
+        if song_index is not None:
+            self.follow_track(song_index)
+
+    def wake(self):
+        if self.wakeup_fds:
+            try:
+                os.write(self.wakeup_fds[1], b"\0")
+            except OSError:
+                pass
+
+    def next_timeout(self):
+        if self.wakeup_fds is None and self.scanners:
+            return 0.02
+        timeout = 1.0
+        if self.player.playing:
+            remaining = self.player.time_remaining()
+            if remaining is not None:
+                timeout = min(timeout, max(0.02, remaining) if remaining > 0 else OVERRUN_POLL)
+        return timeout
+
+    def enqueue(self, song):
+        if song not in self.queue_list:
+            self.queue_list.append(song)
+
+    def dequeue(self, index):
+        if not 0 <= index < len(self.queue_list):
+            return False
+        del self.queue_list[index]
+        if self.queue_index > index:
+            self.queue_index -= 1
+        return True
+
+    def clear_queue(self):
+        self.queue_list = []
+        self.queue_index = 0
+
+    def set_volume(self, volume):
+        self.volume = min(1.0, max(0.0, volume))
+        self.player.set_volume(self.volume)
+
+    def set_shuffle(self, shuffle):
+        self.shuffle = shuffle
+
+    def set_repeat(self, repeat):
+        self.repeat = repeat
+
+    def save_state(self):
+        self.config["volume"] = self.volume
+        self.config["shuffle"] = self.shuffle
+        self.config["repeat"] = self.repeat
+        save_config(self.config)
+
+    def next_song(self):
+        if self.playlist:
+            song, from_queue = self.next_pick
+            planned = self.next_key and self.next_key[0] == self.current_song_path
+            if self.shuffle and planned and song and not from_queue:
+                next_idx = self.tracks.position(song, 0)
+            elif self.shuffle:
+                next_idx = random.randint(0, len(self.playlist) - 1)
+            else:
+                current_idx = self.tracks.position(self.current_song_path)
+                if current_idx is not None:
+                    next_idx = (current_idx + 1) % len(self.playlist)
+                else:
+                    next_idx = 0
+            self.follow_track(next_idx)
+            self.play_song(self.playlist[next_idx])
+
+    def prev_song(self):
+        if self.playlist:
+            if self.shuffle:
+                prev_idx = random.randint(0, len(self.playlist) - 1)
+            else:
+                current_idx = self.tracks.position(self.current_song_path)
+                if current_idx is not None:
+                    prev_idx = (current_idx - 1) % len(self.playlist)
+                else:
+                    prev_idx = 0
+            self.follow_track(prev_idx)
+            self.play_song(self.playlist[prev_idx])
+
+    def toggle_play_pause(self):
+        if self.player.playing:
+            self.player.pause()
+        else:
+            self.player.unpause()
+
+    def close(self):
+        for scanner in self.scanners.values():
+            scanner.cancel()
+        self.stop_watcher()
+        self.dump_stats(force=True)
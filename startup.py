@@ -0,0 +1,14 @@
+import sys
+import time
+
+started = time.perf_counter()
+marks = []
+
+def mark(label):
+    marks.append((label, time.perf_counter() - started))
+
+def report(file=sys.stderr):
+    previous = 0.0
+    for label, at in sorted(marks, key=lambda m: m[1]):
+        print(f"{at * 1000:8.1f} ms  (+{(at - previous) * 1000:7.1f})  {label}", file=file)
+        previous = at
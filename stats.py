@@ -0,0 +1,68 @@
+import json
+import time
+import threading
+from collections import deque
+
+WINDOW = 512
+
+class Timer:
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.worst = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        if seconds > self.worst:
+            self.worst = seconds
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": self.count,
+            "p50_ms": ordered[len(ordered) // 2] * 1000,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            "max_ms": self.worst * 1000
+        }
+
+timers = {}
+gauges = {}
+sources = {}
+_lock = threading.Lock()
+
+def record(name, seconds):
+    with _lock:
+        timer = timers.get(name)
+        if timer is None:
+            timer = timers[name] = Timer()
+        timer.add(seconds)
+
+def gauge(name, value):
+    with _lock:
+        gauges[name] = value
+
+def register(name, source):
+    sources[name] = source
+
+def snapshot():
+    with _lock:
+        data = {name: timer.summary() for name, timer in timers.items()}
+        data.update(gauges)
+    for name, source in list(sources.items()):
+        try:
+            data[name] = source()
+        except Exception:
+            pass
+    return data
+
+def dump(path, **extra):
+    line = {"time": round(time.time(), 3), **extra, **snapshot()}
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,829 @@
+import os
+import sys
+import mmap
+import heapq
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left, insort
+from metadata import format_duration
+
+MAGIC = b"MUSETRKS"
+VERSION = 2
+BYTE_ORDER_MARK = 0x01020304
+HEADER = struct.Struct("=8sIIqIIII")
+SECTION_TYPES = (
+    "Q", "s", "Q", "s", "Q", "s", "Q", "s", "Q", "s", "i", "i", "i", "i", "i", "i", "Q", "s",
+    "i", "i", "i", "Q", "Q", "s", "i", "Q", "Q", "s", "i"
+)
+SECTIONS = struct.Struct(f"={2 * len(SECTION_TYPES)}Q")
+
+def track_label(name, seconds, disc, number):
+    prefix = ""
+    if number:
+        prefix = f"{disc}-{number:02}. " if disc > 1 else f"{number:2}. "
+    return f"{prefix}{name} [{format_duration(None if seconds < 0 else seconds)}]"
+
+def album_label(name, artist, count):
+    title = f"{name} - {artist}" if artist else name
+    return f"{title} ({count} {'track' if count == 1 else 'tracks'})"
+
+def artist_label(name, count):
+    return f"{name or '[Unknown artist]'} ({count} {'album' if count == 1 else 'albums'})"
+
+class Track:
+    __slots__ = ("path", "name", "title", "artist", "album", "duration", "album_artist", "disc", "number")
+
+    def __init__(self, path, name, title, artist, album, duration, album_artist="", disc=0, number=0):
+        self.path = path
+        self.name = name
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.duration = duration
+        self.album_artist = album_artist
+        self.disc = disc
+        self.number = number
+
+class Column:
+    __slots__ = ("store", "field", "ids")
+
+    def __init__(self, store, field, ids=None):
+        self.store = store
+        self.field = field
+        self.ids = ids
+
+    def _ids(self):
+        return self.store.order if self.ids is None else self.ids
+
+    def value(self, t):
+        return getattr(self.store, self.field)[t]
+
+    def __len__(self):
+        return len(self._ids())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.value(t) for t in self._ids()[i]]
+        return self.value(self._ids()[i])
+
+    def __iter__(self):
+        return (self.value(t) for t in self._ids())
+
+class NameColumn(Column):
+    __slots__ = ("table",)
+
+    def __init__(self, store, field, table, ids=None):
+        super().__init__(store, field, ids)
+        self.table = table
+
+    def value(self, t):
+        return getattr(self.store, self.table)[getattr(self.store, self.field)[t]]
+
+class SecondsColumn(Column):
+    __slots__ = ()
+
+    def value(self, t):
+        seconds = self.store.seconds[t]
+        return None if seconds < 0 else seconds
+
+class DurationColumn(SecondsColumn):
+    __slots__ = ()
+
+    def value(self, t):
+        return format_duration(super().value(t))
+
+class StringTable:
+    __slots__ = ("buf", "offsets", "start")
+
+    def __init__(self, buf, offsets, start=0):
+        self.buf = buf
+        self.offsets = offsets
+        self.start = start
+
+    def __len__(self):
+        return len(self.offsets) - 1 - self.start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        i += self.start
+        return str(self.buf[self.offsets[i]:self.offsets[i + 1]], "utf-8", "surrogatepass")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class BucketIndex:
+    __slots__ = ("ids", "starts")
+
+    def __init__(self, ids, starts):
+        self.ids = ids
+        self.starts = starts
+
+    def get(self, key, default=None):
+        if 0 <= key < len(self.starts) - 1 and self.starts[key] < self.starts[key + 1]:
+            return self.ids[self.starts[key]:self.starts[key + 1]]
+        return default
+
+    def __iter__(self):
+        return (key for key in range(len(self.starts) - 1) if self.starts[key] < self.starts[key + 1])
+
+class Album:
+    __slots__ = ("store", "gid")
+
+    def __init__(self, store, gid):
+        self.store = store
+        self.gid = gid
+
+    @property
+    def name(self):
+        return self.store.albums[self.store.album_name_ids[self.gid]]
+
+    @property
+    def artist(self):
+        return self.store.artists[self.store.album_owners[self.gid]]
+
+    @property
+    def label(self):
+        return self.store.album_labels[self.gid]
+
+    @property
+    def songs(self):
+        return self.store.column("path", self.store.album_tracks.get(self.gid, ()))
+
+    @property
+    def labels(self):
+        return self.store.column("label", self.store.album_tracks.get(self.gid, ()))
+
+    def __len__(self):
+        return len(self.store.album_tracks.get(self.gid, ()))
+
+class Artist:
+    __slots__ = ("store", "owner")
+
+    def __init__(self, store, owner):
+        self.store = store
+        self.owner = owner
+
+    @property
+    def name(self):
+        return self.store.artists[self.owner]
+
+    @property
+    def label(self):
+        return self.store.artist_labels[self.owner]
+
+    @property
+    def albums(self):
+        return EntryList(Album, self.store, self.store.artist_albums.get(self.owner, ()))
+
+class EntryList:
+    __slots__ = ("kind", "store", "ids")
+
+    def __init__(self, kind, store, ids):
+        self.kind = kind
+        self.store = store
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.kind(self.store, key) for key in self.ids[i]]
+        return self.kind(self.store, self.ids[i])
+
+    def __iter__(self):
+        return (self.kind(self.store, key) for key in self.ids)
+
+class TrackStore:
+    __slots__ = (
+        "paths", "names", "titles", "artist_ids", "album_ids", "seconds", "artists", "albums",
+        "album_artist_ids", "discs", "numbers", "labels", "_artist_lookup", "_album_lookup",
+        "album_owners", "album_name_ids", "album_labels", "_group_lookup", "album_tracks",
+        "artist_albums", "artist_labels", "owners", "order", "generation", "mapped"
+    )
+
+    def __init__(self):
+        self.paths = []
+        self.names = []
+        self.titles = []
+        self.artist_ids = array("i")
+        self.album_ids = array("i")
+        self.seconds = array("i")
+        self.artists = [""]
+        self.albums = [""]
+        self.album_artist_ids = array("i")
+        self.discs = array("i")
+        self.numbers = array("i")
+        self.labels = []
+        self._artist_lookup = {"": 0}
+        self._album_lookup = {"": 0}
+        self.album_owners = array("i", [0])
+        self.album_name_ids = array("i", [0])
+        self.album_labels = [""]
+        self._group_lookup = {}
+        self.album_tracks = {}
+        self.artist_albums = {}
+        self.artist_labels = {}
+        self.owners = None
+        self.order = array("i")
+        self.generation = None
+        self.mapped = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        store = cls()
+        for row in rows:
+            track_id = store._append(*row)
+            store.order.append(track_id)
+            group_id = store._group(track_id, create=True)
+            if group_id:
+                store.album_tracks.setdefault(group_id, []).append(track_id)
+        for group_id, ids in store.album_tracks.items():
+            store.album_tracks[group_id] = array("i", sorted(ids, key=store._track_key))
+            store.artist_albums.setdefault(store.album_owners[group_id], []).append(group_id)
+            store._label_album(group_id)
+        for owner, group_ids in store.artist_albums.items():
+            store.artist_albums[owner] = array("i", sorted(group_ids, key=store._album_name))
+            store._label_artist(owner)
+        return store
+
+    @classmethod
+    def open(cls, path):
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            return cls._from_mapped(mapped)
+        except (ValueError, TypeError, struct.error):
+            return None
+
+    @classmethod
+    def _from_mapped(cls, mapped):
+        if len(mapped) < HEADER.size + SECTIONS.size:
+            raise ValueError("truncated track cache")
+        magic, version, marker, generation, count, artist_count, album_count, group_count = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION or marker != BYTE_ORDER_MARK:
+            raise ValueError("unsupported track cache")
+        layout = SECTIONS.unpack_from(mapped, HEADER.size)
+        buf = memoryview(mapped)
+        sections = []
+        for i, kind in enumerate(SECTION_TYPES):
+            offset, size = layout[2 * i], layout[2 * i + 1]
+            if offset + size > len(mapped):
+                raise ValueError("truncated track cache")
+            section = buf[offset:offset + size]
+            sections.append(section if kind == "s" else section.cast(kind))
+        (path_offsets, path_data, name_offsets, name_data, title_offsets, title_data,
+         artist_offsets, artist_data, album_offsets, album_data, artist_ids, album_ids, seconds,
+         album_artist_ids, discs, numbers, label_offsets, label_data,
+         album_owners, album_name_ids, album_track_ids, album_starts, album_label_offsets, album_label_data,
+         artist_album_ids, artist_starts, artist_label_offsets, artist_label_data, owners) = sections
+        if (len(path_offsets) != count + 1 or len(artist_offsets) != artist_count + 1
+                or len(album_offsets) != album_count + 1 or len(seconds) != count
+                or len(album_owners) != group_count + 1 or len(artist_starts) != artist_count + 1):
+            raise ValueError("inconsistent track cache")
+        store = cls()
+        store.paths = StringTable(path_data, path_offsets)
+        store.names = StringTable(name_data, name_offsets)
+        store.titles = StringTable(title_data, title_offsets)
+        store.artists = StringTable(artist_data, artist_offsets)
+        store.albums = StringTable(album_data, album_offsets)
+        store.labels = StringTable(label_data, label_offsets)
+        store.artist_ids = artist_ids
+        store.album_ids = album_ids
+        store.seconds = seconds
+        store.album_artist_ids = album_artist_ids
+        store.discs = discs
+        store.numbers = numbers
+        store.album_owners = album_owners
+        store.album_name_ids = album_name_ids
+        store.album_labels = StringTable(album_label_data, album_label_offsets)
+        store.album_tracks = BucketIndex(album_track_ids, album_starts)
+        store.artist_albums = BucketIndex(artist_album_ids, artist_starts)
+        store.artist_labels = StringTable(artist_label_data, artist_label_offsets)
+        store.owners = owners
+        store.order = range(count)
+        store._artist_lookup = None
+        store._album_lookup = None
+        store._group_lookup = None
+        store.generation = generation
+        store.mapped = mapped
+        return store
+
+    def materialized(self):
+        if self.mapped is None:
+            return self
+        store = TrackStore()
+        store.paths = list(self.paths)
+        store.names = list(self.names)
+        store.titles = list(self.titles)
+        store.labels = list(self.labels)
+        store.artists = [sys.intern(name) for name in self.artists]
+        store.albums = [sys.intern(name) for name in self.albums]
+        for field in ("artist_ids", "album_ids", "seconds", "album_artist_ids", "discs", "numbers", "album_owners", "album_name_ids"):
+            setattr(store, field, array("i", getattr(self, field).tobytes()))
+        store.album_labels = list(self.album_labels)
+        store.album_tracks = {group_id: array("i", self.album_tracks.get(group_id).tobytes()) for group_id in self.album_tracks}
+        store.artist_albums = {owner: array("i", self.artist_albums.get(owner).tobytes()) for owner in self.artist_albums}
+        store.artist_labels = {owner: self.artist_labels[owner] for owner in self.artist_albums}
+        store.order = array("i", self.order)
+        store._artist_lookup = None
+        store._album_lookup = None
+        store._group_lookup = None
+        store.generation = self.generation
+        return store
+
+    def _materialize(self):
+        if self.mapped is None:
+            return
+        store = self.materialized()
+        for field in self.__slots__:
+            setattr(self, field, getattr(store, field))
+
+    def save(self, path, generation=0):
+        order = list(self.order)
+        artists = [""] + sorted(({self.artists[self.artist_ids[t]] for t in order} | {self.artists[self.album_artist_ids[t]] for t in order}) - {""})
+        artist_lookup = {name: i for i, name in enumerate(artists)}
+        albums = [""] + sorted({self.albums[self.album_ids[t]] for t in order} - {""})
+        album_lookup = {name: i for i, name in enumerate(albums)}
+        artist_ids = array("i")
+        album_ids = array("i")
+        album_artist_ids = array("i")
+        members = {}
+        for i, t in enumerate(order):
+            artist_ids.append(artist_lookup[self.artists[self.artist_ids[t]]])
+            album_ids.append(album_lookup[self.albums[self.album_ids[t]]])
+            album_artist_ids.append(artist_lookup[self.artists[self.album_artist_ids[t]]])
+            if album_ids[i]:
+                members.setdefault((album_ids[i], album_artist_ids[i] or artist_ids[i]), []).append(i)
+        album_owners = array("i", [0])
+        album_name_ids = array("i", [0])
+        album_track_ids = array("i")
+        album_starts = array("Q", [0, 0])
+        album_labels = [""]
+        buckets = [[] for _ in artists]
+        for album_id, owner in sorted(members, key=lambda key: (albums[key[0]], artists[key[1]])):
+            positions = sorted(members[album_id, owner], key=lambda i: self._track_key(order[i]))
+            buckets[owner].append(len(album_owners))
+            album_owners.append(owner)
+            album_name_ids.append(album_id)
+            album_track_ids.extend(positions)
+            album_starts.append(len(album_track_ids))
+            album_labels.append(album_label(albums[album_id], artists[owner], len(positions)))
+        artist_album_ids = array("i")
+        artist_starts = array("Q", [0])
+        for bucket in buckets:
+            artist_album_ids.extend(bucket)
+            artist_starts.append(len(artist_album_ids))
+        sections = []
+        for values in (
+            [self.paths[t] for t in order], [self.names[t] for t in order], [self.titles[t] for t in order],
+            artists, albums
+        ):
+            offsets, data = encode_strings(values)
+            sections += [offsets.tobytes(), data]
+        sections += [
+            artist_ids.tobytes(), album_ids.tobytes(), array("i", (self.seconds[t] for t in order)).tobytes(),
+            album_artist_ids.tobytes(), array("i", (self.discs[t] for t in order)).tobytes(),
+            array("i", (self.numbers[t] for t in order)).tobytes()
+        ]
+        offsets, data = encode_strings([self.labels[t] for t in order])
+        sections += [offsets.tobytes(), data, album_owners.tobytes(), album_name_ids.tobytes(), album_track_ids.tobytes(), album_starts.tobytes()]
+        offsets, data = encode_strings(album_labels)
+        sections += [offsets.tobytes(), data, artist_album_ids.tobytes(), artist_starts.tobytes()]
+        offsets, data = encode_strings([artist_label(name, len(bucket)) for name, bucket in zip(artists, buckets)])
+        sections += [offsets.tobytes(), data, array("i", (owner for owner, bucket in enumerate(buckets) if bucket)).tobytes()]
+        layout = []
+        offset = HEADER.size + SECTIONS.size
+        for data in sections:
+            offset += -offset % 8
+            layout += [offset, len(data)]
+            offset += len(data)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, generation, len(order), len(artists), len(albums), len(album_owners) - 1))
+                f.write(SECTIONS.pack(*layout))
+                for (start, _), data in zip(zip(layout[::2], layout[1::2]), sections):
+                    f.write(b"\0" * (start - f.tell()))
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            return True
+        except OSError:
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return False
+
+    def __len__(self):
+        return len(self.order)
+
+    def _lookup(self, kind):
+        if kind == "artist":
+            if self._artist_lookup is None:
+                self._artist_lookup = {name: i for i, name in enumerate(self.artists)}
+            return self._artist_lookup
+        if self._album_lookup is None:
+            self._album_lookup = {name: i for i, name in enumerate(self.albums)}
+        return self._album_lookup
+
+    def _intern(self, kind, name):
+        if not name:
+            return 0
+        lookup = self._lookup(kind)
+        name_id = lookup.get(name)
+        if name_id is None:
+            table = self.artists if kind == "artist" else self.albums
+            name_id = lookup[name] = len(table)
+            table.append(sys.intern(name))
+        return name_id
+
+    def _append(self, path, name, title, artist, album, duration, album_artist="", disc=0, number=0):
+        self.paths.append(path)
+        self.names.append(name)
+        self.titles.append(title or "")
+        self.artist_ids.append(self._intern("artist", artist))
+        self.album_ids.append(self._intern("album", album))
+        self.seconds.append(-1 if duration is None else duration)
+        self.album_artist_ids.append(self._intern("artist", album_artist))
+        self.discs.append(disc or 0)
+        self.numbers.append(number or 0)
+        self.labels.append(track_label(name, self.seconds[-1], self.discs[-1], self.numbers[-1]))
+        return len(self.paths) - 1
+
+    def _path_key(self, track_id):
+        return self.paths[track_id]
+
+    def _track_key(self, track_id):
+        number = self.numbers[track_id]
+        return self.discs[track_id] or 1, not number, number, self.paths[track_id]
+
+    def _album_name(self, group_id):
+        return self.albums[self.album_name_ids[group_id]]
+
+    def _group_key(self, group_id):
+        return self.albums[self.album_name_ids[group_id]], self.artists[self.album_owners[group_id]]
+
+    def _group(self, track_id, create=False):
+        album_id = self.album_ids[track_id]
+        if not album_id:
+            return 0
+        if self._group_lookup is None:
+            self._group_lookup = {key: group_id for group_id, key in enumerate(zip(self.album_owners, self.album_name_ids)) if group_id}
+        key = (self.album_artist_ids[track_id] or self.artist_ids[track_id], album_id)
+        group_id = self._group_lookup.get(key, 0)
+        if not group_id and create:
+            group_id = self._group_lookup[key] = len(self.album_owners)
+            self.album_owners.append(key[0])
+            self.album_name_ids.append(album_id)
+            self.album_labels.append("")
+        return group_id
+
+    def _label_album(self, group_id):
+        owner = self.album_owners[group_id]
+        name = self.albums[self.album_name_ids[group_id]]
+        self.album_labels[group_id] = album_label(name, self.artists[owner], len(self.album_tracks.get(group_id, ())))
+
+    def _label_artist(self, owner):
+        group_ids = self.artist_albums.get(owner)
+        if group_ids:
+            self.artist_labels[owner] = artist_label(self.artists[owner], len(group_ids))
+        else:
+            self.artist_labels.pop(owner, None)
+
+    def position(self, path, default=None):
+        if path is None:
+            return default
+        i = bisect_left(self.order, path, key=self._path_key)
+        if i < len(self.order) and self.paths[self.order[i]] == path:
+            return i
+        return default
+
+    def track(self, i):
+        t = self.order[i]
+        seconds = self.seconds[t]
+        return Track(
+            self.paths[t], self.names[t], self.titles[t], self.artists[self.artist_ids[t]],
+            self.albums[self.album_ids[t]], None if seconds < 0 else seconds,
+            self.artists[self.album_artist_ids[t]], self.discs[t], self.numbers[t]
+        )
+
+    def _unlink_album(self, track_id):
+        group_id = self._group(track_id)
+        ids = self.album_tracks.get(group_id)
+        if ids is None:
+            return
+        i = bisect_left(ids, self._track_key(track_id), key=self._track_key)
+        if i < len(ids) and ids[i] == track_id:
+            del ids[i]
+        if ids:
+            self._label_album(group_id)
+            return
+        del self.album_tracks[group_id]
+        owner = self.album_owners[group_id]
+        group_ids = self.artist_albums[owner]
+        del group_ids[group_ids.index(group_id)]
+        if not group_ids:
+            del self.artist_albums[owner]
+        self._label_artist(owner)
+
+    def _link_album(self, track_id):
+        group_id = self._group(track_id, create=True)
+        if not group_id:
+            return
+        ids = self.album_tracks.get(group_id)
+        if ids is None:
+            ids = self.album_tracks[group_id] = array("i")
+            owner = self.album_owners[group_id]
+            insort(self.artist_albums.setdefault(owner, array("i")), group_id, key=self._album_name)
+            self._label_artist(owner)
+        insort(ids, track_id, key=self._track_key)
+        self._label_album(group_id)
+
+    def update(self, path, info):
+        i = self.position(path)
+        if i is None:
+            return False
+        self._materialize()
+        t = self.order[i]
+        self._unlink_album(t)
+        self.names[t] = info["name"]
+        self.titles[t] = info["title"] or ""
+        self.artist_ids[t] = self._intern("artist", info["artist"])
+        self.album_ids[t] = self._intern("album", info["album"])
+        self.seconds[t] = -1 if info["duration"] is None else info["duration"]
+        self.album_artist_ids[t] = self._intern("artist", info["album_artist"])
+        self.discs[t] = info["disc"] or 0
+        self.numbers[t] = info["number"] or 0
+        self.labels[t] = track_label(self.names[t], self.seconds[t], self.discs[t], self.numbers[t])
+        self._link_album(t)
+        return True
+
+    def insert(self, path, info):
+        if self.update(path, info):
+            return self.position(path)
+        self._materialize()
+        track_id = self._append(
+            path, info["name"], info["title"], info["artist"], info["album"], info["duration"],
+            info["album_artist"], info["disc"], info["number"]
+        )
+        i = bisect_left(self.order, path, key=self._path_key)
+        self.order.insert(i, track_id)
+        self._link_album(track_id)
+        return i
+
+    def remove(self, path):
+        i = self.position(path)
+        if i is None:
+            return None
+        self._materialize()
+        t = self.order[i]
+        self._unlink_album(t)
+        del self.order[i]
+        self.paths[t] = None
+        self.names[t] = self.titles[t] = self.labels[t] = ""
+        self.artist_ids[t] = self.album_ids[t] = self.album_artist_ids[t] = 0
+        return i
+
+    def column(self, field, ids=None):
+        if field == "path":
+            return Column(self, "paths", ids)
+        if field == "name":
+            return Column(self, "names", ids)
+        if field == "title":
+            return Column(self, "titles", ids)
+        if field == "label":
+            return Column(self, "labels", ids)
+        if field == "artist":
+            return NameColumn(self, "artist_ids", "artists", ids)
+        if field == "album":
+            return NameColumn(self, "album_ids", "albums", ids)
+        if field == "duration":
+            return SecondsColumn(self, "seconds", ids)
+        if field == "duration_label":
+            return DurationColumn(self, "seconds", ids)
+        raise KeyError(field)
+
+    def fields(self):
+        return {field: self.column(field) for field in ("artist", "title", "album", "duration")}
+
+    def album_list(self):
+        if self.mapped is not None:
+            return EntryList(Album, self, range(1, len(self.album_owners)))
+        return EntryList(Album, self, sorted(self.album_tracks, key=self._group_key))
+
+    def artist_list(self):
+        if self.mapped is not None:
+            return EntryList(Artist, self, self.owners)
+        return EntryList(Artist, self, sorted(self.artist_albums, key=self.artists.__getitem__))
+
+class MergedColumn:
+    __slots__ = ("shards", "field")
+
+    def __init__(self, shards, field):
+        self.shards = shards
+        self.field = field
+
+    def _parts(self):
+        return [store.column(self.field) for store in self.shards.stores]
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts())
+
+    def __getitem__(self, i):
+        parts = self._parts()
+        if isinstance(i, slice):
+            start, stop, step = i.indices(sum(len(part) for part in parts))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            values = []
+            for part in parts:
+                size = len(part)
+                if start < size and stop > 0:
+                    values += part[max(0, start):min(size, stop)]
+                start -= size
+                stop -= size
+            return values
+        if i < 0:
+            i += sum(len(part) for part in parts)
+        for part in parts:
+            if 0 <= i < len(part):
+                return part[i]
+            i -= len(part)
+        raise IndexError("column index out of range")
+
+    def __iter__(self):
+        for part in self._parts():
+            yield from part
+
+class MergedAlbum:
+    __slots__ = ("parts", "name", "artist", "label", "_songs", "_labels")
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.name = parts[0].name
+        self.artist = parts[0].artist
+        self.label = album_label(self.name, self.artist, len(self))
+        self._songs = None
+        self._labels = None
+
+    def _merge(self):
+        rows = []
+        for part in self.parts:
+            store = part.store
+            rows += [(store._track_key(t), store.paths[t], store.labels[t]) for t in store.album_tracks.get(part.gid, ())]
+        rows.sort()
+        self._songs = [row[1] for row in rows]
+        self._labels = [row[2] for row in rows]
+
+    @property
+    def songs(self):
+        if self._songs is None:
+            self._merge()
+        return self._songs
+
+    @property
+    def labels(self):
+        if self._labels is None:
+            self._merge()
+        return self._labels
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+class MergedArtist:
+    __slots__ = ("name", "albums", "label")
+
+    def __init__(self, parts):
+        self.name = parts[0].name
+        self.albums = merge_entries([part.albums for part in parts], album_key, MergedAlbum)
+        self.label = artist_label(self.name, len(self.albums))
+
+def album_key(album):
+    return album.name, album.artist
+
+def artist_key(artist):
+    return artist.name
+
+def merge_entries(lists, key, merged):
+    groups = []
+    for entry in heapq.merge(*lists, key=key):
+        if groups and key(groups[-1][0]) == key(entry):
+            groups[-1].append(entry)
+        else:
+            groups.append([entry])
+    return [group[0] if len(group) == 1 else merged(group) for group in groups]
+
+class ShardedStore:
+    __slots__ = ("roots", "stores")
+
+    def __init__(self):
+        self.roots = []
+        self.stores = []
+
+    @staticmethod
+    def _prefix(root):
+        return os.path.join(root, "")
+
+    def shard(self, path):
+        if path is None:
+            return None
+        for k, root in enumerate(self.roots):
+            if path.startswith(self._prefix(root)):
+                return k
+        return None
+
+    def set_shard(self, root, store):
+        if root in self.roots:
+            self.stores[self.roots.index(root)] = store
+            return
+        prefixes = [self._prefix(r) for r in self.roots]
+        k = bisect_left(prefixes, self._prefix(root))
+        self.roots.insert(k, root)
+        self.stores.insert(k, store)
+
+    def remove_shard(self, root):
+        if root in self.roots:
+            k = self.roots.index(root)
+            del self.roots[k]
+            del self.stores[k]
+
+    def get(self, root):
+        if root in self.roots:
+            return self.stores[self.roots.index(root)]
+        return None
+
+    def _offset(self, k):
+        return sum(len(store) for store in self.stores[:k])
+
+    def __len__(self):
+        return sum(len(store) for store in self.stores)
+
+    def position(self, path, default=None):
+        k = self.shard(path)
+        if k is None:
+            return default
+        i = self.stores[k].position(path)
+        return default if i is None else self._offset(k) + i
+
+    def track(self, i):
+        if i < 0:
+            i += len(self)
+        for store in self.stores:
+            if 0 <= i < len(store):
+                return store.track(i)
+            i -= len(store)
+        raise IndexError("track index out of range")
+
+    def update(self, path, info):
+        k = self.shard(path)
+        return k is not None and self.stores[k].update(path, info)
+
+    def insert(self, path, info):
+        k = self.shard(path)
+        if k is None:
+            return None
+        return self._offset(k) + self.stores[k].insert(path, info)
+
+    def remove(self, path):
+        k = self.shard(path)
+        if k is None:
+            return None
+        i = self.stores[k].remove(path)
+        return None if i is None else self._offset(k) + i
+
+    def column(self, field):
+        return MergedColumn(self, field)
+
+    def fields(self):
+        return {field: self.column(field) for field in ("artist", "title", "album", "duration")}
+
+    def album_list(self):
+        if len(self.stores) == 1:
+            return self.stores[0].album_list()
+        return merge_entries([store.album_list() for store in self.stores], album_key, MergedAlbum)
+
+    def artist_list(self):
+        if len(self.stores) == 1:
+            return self.stores[0].artist_list()
+        return merge_entries([store.artist_list() for store in self.stores], artist_key, MergedArtist)
+
+def encode_strings(values):
+    offsets = array("Q", [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode("utf-8", "surrogatepass")
+        offsets.append(len(data))
+    return offsets, bytes(data)
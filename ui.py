@@ -79,11 +79,42 @@ def help_text(keybindings):
         lines.append(f"{'/'.join(keys)}: {desc}")
     lines.append("")
     lines.append("Other commands:")
-    lines.append(":a <folder> - Add/change music folder")
-    lines.append(":refresh - Rescan music folder and update library")
+    lines.append("/artist:<name> album:<name> title:<name> duration>N - Filter search by field")
+    lines.append(":a <folder> - Add a music folder")
+    lines.append(":d <folder> - Remove a music folder")
+    lines.append(":refresh - Rescan music folders and update library")
+    lines.append(":cancel - Stop a running library scan")
+    lines.append(":stats - Toggle the performance overlay")
     lines.append(":clear - Clear queue")
     lines.append(":remove <n> - Remove nth song from queue")
     lines.append(":q - Quit Muse")
     lines.append(":v or :version - Show version")
     lines.append(":help - Show this help")
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+def stats_lines(data):
+    lines = ["Performance (:stats to hide)"]
+    for label, key in (("Frame", "frame"), ("Input", "input_latency"), ("Search", "search")):
+        timer = data.get(key)
+        if timer and timer["count"]:
+            lines.append(f"{label:9} p50 {timer['p50_ms']:6.1f}ms  p95 {timer['p95_ms']:6.1f}ms  max {timer['max_ms']:6.1f}ms")
+        else:
+            lines.append(f"{label:9} -")
+    scan = data.get("scan") or {}
+    text = f"{scan['tracks_per_s']:.0f} tracks/s ({scan['active']} active)" if scan.get("active") else "idle"
+    if "scan_tracks_per_s" in data:
+        text += f", last {data['scan_tracks_per_s']:.0f} tracks/s"
+    lines.append(f"{'Scan':9} {text}")
+    cache = data.get("metadata_cache")
+    if cache:
+        lines.append(f"{'Metadata':9} {cache['hit_rate'] * 100:5.1f}% hits ({cache['hits']}/{cache['hits'] + cache['misses']})")
+    prefetch = data.get("prefetch")
+    if prefetch:
+        lines.append(f"{'Prefetch':9} {prefetch['hit_rate'] * 100:5.1f}% hits, {prefetch['bytes_read'] / 2**20:.1f} MiB read")
+    transitions = data.get("transitions")
+    if transitions:
+        lines.append(
+            f"{'Gap':9} avg {transitions['avg_gap_ms']:.0f}ms  max {transitions['max_gap_ms']:.0f}ms  "
+            f"({transitions['gapless']}/{transitions['count']} gapless)"
+        )
+    return lines
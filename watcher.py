@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import threading
+import library
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+SNAPSHOT_DELAY = 30.0
+SNAPSHOT_COST_SHARE = 0.02
+
+class InotifyBackend:
+    def __init__(self, root, follow_symlinks=True):
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ctypes = ctypes
+        self.root = root
+        self.follow_symlinks = follow_symlinks
+        self.watches = {}
+        try:
+            self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        os.close(self.fd)
+
+    def add_tree(self, path):
+        for folder, _ in library.iter_folders(path, self.follow_symlinks):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                errno = self.ctypes.get_errno()
+                raise OSError(errno, f"inotify_add_watch failed for {folder}: {os.strerror(errno)}")
+            self.watches[wd] = folder
+
+    def wait(self, timeout):
+        try:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+        except (OSError, ValueError):
+            return set()
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(self.root)
+                    continue
+                folder = self.watches.get(wd)
+                if folder is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self.watches[wd]
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changed.add(folder)
+                    continue
+                path = os.path.join(folder, os.fsdecode(name)) if name else folder
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        try:
+                            self.add_tree(path)
+                        except OSError:
+                            pass
+                    changed.add(path)
+                elif library.is_song(path):
+                    changed.add(path)
+        return changed
+
+class PollBackend:
+    def __init__(self, root, follow_symlinks=True, interval=30.0):
+        self.root = root
+        self.follow_symlinks = follow_symlinks
+        self.interval = interval
+        self.folders = {}
+        self.next_poll = time.monotonic() + interval
+        self.add_tree(root)
+
+    def close(self):
+        pass
+
+    def add_tree(self, path):
+        for folder, files in library.iter_folders(path, self.follow_symlinks):
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                continue
+            self.folders[folder] = (mtime, {entry.name for entry in files if library.is_song(entry.name)})
+
+    def refresh_folder(self, folder, mtime, songs, changed):
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            del self.folders[folder]
+            changed.add(folder)
+            return
+        current = set()
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                    if entry.path not in self.folders:
+                        self.add_tree(entry.path)
+                        changed.add(entry.path)
+                elif library.is_song(entry.name):
+                    current.add(entry.name)
+            except OSError:
+                continue
+        self.folders[folder] = (mtime, current)
+        changed.update(os.path.join(folder, name) for name in current | songs)
+
+    def wait(self, timeout):
+        delay = self.next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, delay))
+        self.next_poll = time.monotonic() + self.interval
+        changed = set()
+        for folder, (mtime, songs) in list(self.folders.items()):
+            try:
+                current = os.stat(folder).st_mtime_ns
+            except OSError:
+                del self.folders[folder]
+                changed.add(folder)
+                continue
+            if current != mtime:
+                self.refresh_folder(folder, current, songs, changed)
+        return changed
+
+class Watcher:
+    def __init__(self, root, follow_symlinks=True, poll_interval=30.0, debounce=1.0, max_delay=5.0, notify=None,
+                 snapshot_delay=SNAPSHOT_DELAY):
+        self.root = root
+        self.follow_symlinks = follow_symlinks
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.notify = notify
+        self.snapshot_delay = snapshot_delay
+        self.updates = queue.Queue()
+        self.backend_name = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _post(self, *message):
+        self.updates.put(message)
+        if self.notify:
+            self.notify()
+
+    def open_backend(self):
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifyBackend(self.root, self.follow_symlinks)
+            except (OSError, AttributeError):
+                pass
+        return PollBackend(self.root, self.follow_symlinks, self.poll_interval)
+
+    def run(self):
+        try:
+            backend = self.open_backend()
+        except Exception as e:
+            self._post("error", f"Library watcher stopped: {e}")
+            return
+        try:
+            index = library.LibraryIndex(library.index_path(self.root))
+        except Exception as e:
+            backend.close()
+            self._post("error", f"Library watcher stopped: {e}")
+            return
+        self.backend_name = type(backend).__name__
+        pending = set()
+        first_at = last_at = dirty_at = None
+        snapshot_delay = self.snapshot_delay
+        try:
+            while not self._stopped.is_set():
+                timeout = 1.0
+                if pending:
+                    now = time.monotonic()
+                    timeout = max(0.0, min(last_at + self.debounce, first_at + self.max_delay) - now)
+                changed = backend.wait(timeout)
+                now = time.monotonic()
+                if changed:
+                    pending |= changed
+                    last_at = now
+                    if first_at is None:
+                        first_at = now
+                if pending and (now >= last_at + self.debounce or now >= first_at + self.max_delay):
+                    if self._stopped.is_set():
+                        break
+                    removed, updated = library.refresh_paths(index, pending, self.follow_symlinks)
+                    pending = set()
+                    first_at = last_at = None
+                    if removed or updated:
+                        self._post("changes", removed, updated)
+                        dirty_at = now
+                if dirty_at is not None and not pending and now >= dirty_at + snapshot_delay:
+                    index.save_snapshot(library.snapshot_path(self.root))
+                    dirty_at = None
+                    snapshot_delay = max(self.snapshot_delay, (time.monotonic() - now) / SNAPSHOT_COST_SHARE)
+                    self._post("snapshot")
+        except Exception as e:
+            self._post("error", f"Library watcher stopped: {e}")
+        finally:
+            backend.close()
+            index.close()